@@ -1,10 +1,11 @@
-import requests
 from datetime import datetime, timedelta
 from typing import Optional, Dict
 import logging
+import os
+import time
+
+from file_utils import file_lock, lock_path
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -14,10 +15,14 @@ class BacenAPI:
     Sistema Gerenciador de Séries Temporais (SGS)
     """
     
-    BASE_URL = "https://api.bcb.gov.br/dados/serie/bcdata.sgs"
+    BASE_URL = os.environ.get("BACEN_BASE_URL", "https://api.bcb.gov.br/dados/serie/bcdata.sgs")
     CODIGO_SELIC = 432   # Meta da Taxa Selic (% a.a.)
     CODIGO_CDI = 4389    # CDI acumulado no ano anualizado (% a.a.)
     TIMEOUT = 10         # Timeout em segundos
+    CACHE_TTL = int(os.environ.get("BACEN_CACHE_TTL", "900"))          # Validade do cache (s)
+    FAILURE_TTL = int(os.environ.get("BACEN_FAILURE_TTL", "60"))       # Espera após falha (s)
+    CACHE_KEY = "taxas_atuais"
+    LOCK_NAME = "bacen_api.lock"
     
     @staticmethod
     def buscar_taxa(codigo_serie: int, nome_taxa: str = "Taxa") -> Optional[float]:
@@ -31,6 +36,9 @@ class BacenAPI:
         Returns:
             float: Valor da taxa em % a.a. ou None em caso de erro
         """
+        # requests é importado apenas no primeiro uso para não pesar no startup
+        import requests
+
         try:
             # Define período de busca (últimos 90 dias para garantir dados)
             data_fim = datetime.now()
@@ -121,9 +129,76 @@ class BacenAPI:
             "data_atualizacao": datetime.now().isoformat()
         }
 
+    
+    @staticmethod
+    def buscar_taxas_com_cache(db) -> Dict[str, Optional[float]]:
+        """
+        Busca SELIC e CDI usando um cache guardado no banco, compartilhado entre todos os workers.
+        Só um processo por vez consulta o BACEN; enquanto isso os demais servem o valor expirado
+        do cache em vez de esperar (só aguardam o lock se ainda não houver cache nenhum).
+        Falhas também ficam em cache (por FAILURE_TTL) para não repetir o timeout a cada requisição.
+        
+        Args:
+            db: Sessão do banco de dados
+            
+        Returns:
+            dict: {"selic": float, "cdi": float, "data_atualizacao": str}
+        """
+        from database import TaxaBacenCache
+        
+        cache = BacenAPI._ler_cache(db)
+        if cache is not None and not cache[1]:
+            return cache[0]
+        
+        with file_lock(lock_path(BacenAPI.LOCK_NAME), blocking=cache is None) as dono:
+            if not dono:
+                # Outro processo está consultando o BACEN: serve o valor expirado
+                return cache[0]
+            
+            # Outro worker pode ter atualizado o cache enquanto esperávamos o lock
+            db.expire_all()
+            cache = BacenAPI._ler_cache(db)
+            if cache is not None and not cache[1]:
+                return cache[0]
+            
+            taxas = BacenAPI.buscar_taxas_atuais()
+            registro = db.get(TaxaBacenCache, BacenAPI.CACHE_KEY)
+            if registro is None:
+                registro = TaxaBacenCache(chave=BacenAPI.CACHE_KEY)
+                db.add(registro)
+            registro.selic = taxas["selic"]
+            registro.cdi = taxas["cdi"]
+            registro.data_atualizacao = taxas["data_atualizacao"]
+            registro.consultado_em = time.time()
+            db.commit()
+            return taxas
+    
+    @staticmethod
+    def _ler_cache(db):
+        """
+        Returns:
+            tuple: (taxas, expirado) ou None se ainda não houver cache
+        """
+        from database import TaxaBacenCache
+        
+        registro = db.get(TaxaBacenCache, BacenAPI.CACHE_KEY)
+        if registro is None:
+            return None
+        
+        sucesso = registro.selic is not None and registro.cdi is not None
+        ttl = BacenAPI.CACHE_TTL if sucesso else BacenAPI.FAILURE_TTL
+        taxas = {
+            "selic": registro.selic,
+            "cdi": registro.cdi,
+            "data_atualizacao": registro.data_atualizacao
+        }
+        return taxas, time.time() - registro.consultado_em > ttl
+
 
 # Para testes diretos do módulo
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
     print("=" * 50)
     print("Testando API do BACEN")
     print("=" * 50)
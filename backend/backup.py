@@ -0,0 +1,215 @@
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from file_utils import atomic_write_path, file_lock
+
+logger = logging.getLogger(__name__)
+
+# Configuração (variáveis de ambiente)
+BACKUP_DIR = os.environ.get("BACKUP_DIR", "backups")
+BACKUP_INTERVAL_MINUTES = float(os.environ.get("BACKUP_INTERVAL_MINUTES", "60"))  # 0 desativa o agendamento
+BACKUP_KEEP = int(os.environ.get("BACKUP_KEEP", "48"))                           # Snapshots mantidos na rotação
+BACKUP_LOCK_PATH = "backup.lock"
+SCHEDULER_LOCK_PATH = "backup_scheduler.lock"
+
+SNAPSHOT_PREFIX = "loans-"
+SNAPSHOT_SUFFIX = ".db.gz"
+TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S%f"       # Microssegundos: dois snapshots no mesmo segundo não colidem
+LEGACY_TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S"  # Snapshots antigos, com resolução de segundos
+
+
+def _database_path() -> str:
+    from database import engine
+    return engine.url.database
+
+
+def _snapshot_timestamp(nome: str) -> Optional[datetime]:
+    if not (nome.startswith(SNAPSHOT_PREFIX) and nome.endswith(SNAPSHOT_SUFFIX)):
+        return None
+    texto = nome[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)]
+    for formato in (TIMESTAMP_FORMAT, LEGACY_TIMESTAMP_FORMAT):
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    return None
+
+
+def list_snapshots():
+    """
+    Lista os snapshots disponíveis, do mais antigo para o mais recente
+
+    Returns:
+        list: [{"nome": str, "data_hora": str, "tamanho_bytes": int}]
+    """
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+
+    snapshots = []
+    for nome in os.listdir(BACKUP_DIR):
+        timestamp = _snapshot_timestamp(nome)
+        if timestamp is None:
+            continue
+        snapshots.append({
+            "nome": nome,
+            "data_hora": timestamp.isoformat(),
+            "tamanho_bytes": os.path.getsize(os.path.join(BACKUP_DIR, nome))
+        })
+    return sorted(snapshots, key=lambda s: s["data_hora"])
+
+
+def create_snapshot():
+    """
+    Cria um snapshot consistente do banco com a API de backup online do SQLite,
+    comprimido com gzip, e aplica a rotação (BACKUP_KEEP)
+
+    Returns:
+        dict: Informações do snapshot criado
+    """
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+
+    with file_lock(os.path.join(BACKUP_DIR, BACKUP_LOCK_PATH)):
+        return _create_snapshot_locked()
+
+
+def _create_snapshot_locked():
+    # Deve ser chamada com BACKUP_LOCK_PATH adquirido
+    timestamp = datetime.now()
+    destino = _snapshot_path(timestamp)
+    while os.path.exists(destino):
+        timestamp += timedelta(microseconds=1)
+        destino = _snapshot_path(timestamp)
+    nome = os.path.basename(destino)
+
+    fd, copia_path = tempfile.mkstemp(dir=BACKUP_DIR, suffix=".db.tmp")
+    os.close(fd)
+    try:
+        # A API de backup copia páginas de forma consistente sem bloquear os escritores por muito tempo
+        origem = sqlite3.connect(_database_path())
+        copia = sqlite3.connect(copia_path)
+        try:
+            origem.backup(copia)
+        finally:
+            copia.close()
+            origem.close()
+
+        with atomic_write_path(destino) as temp_path:
+            with open(copia_path, "rb") as entrada, gzip.open(temp_path, "wb") as saida:
+                shutil.copyfileobj(entrada, saida)
+    finally:
+        os.remove(copia_path)
+
+    _rotate(BACKUP_KEEP)
+
+    logger.info(f"💾 Snapshot do banco criado: {nome}")
+    return {
+        "nome": nome,
+        "data_hora": timestamp.isoformat(),
+        "tamanho_bytes": os.path.getsize(destino)
+    }
+
+
+def _snapshot_path(timestamp: datetime) -> str:
+    return os.path.join(BACKUP_DIR, f"{SNAPSHOT_PREFIX}{timestamp.strftime(TIMESTAMP_FORMAT)}{SNAPSHOT_SUFFIX}")
+
+
+def _rotate(keep: int):
+    snapshots = list_snapshots()
+    for snapshot in snapshots[:max(0, len(snapshots) - keep)]:
+        os.remove(os.path.join(BACKUP_DIR, snapshot["nome"]))
+
+
+def restore_snapshot(data_hora: datetime):
+    """
+    Restaura o banco para o snapshot mais recente feito até `data_hora`.
+    Antes de restaurar, um snapshot do estado atual é criado para permitir desfazer.
+
+    Args:
+        data_hora: Ponto no tempo desejado
+
+    Returns:
+        dict: Snapshot restaurado e snapshot de segurança criado
+
+    Raises:
+        ValueError: Se não houver snapshot até a data informada
+    """
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+
+    # Tudo sob o lock de backup: nem a rotação do snapshot de segurança nem o agendador
+    # podem apagar o snapshot escolhido antes de ele ser lido
+    with file_lock(os.path.join(BACKUP_DIR, BACKUP_LOCK_PATH)):
+        candidatos = [s for s in list_snapshots() if datetime.fromisoformat(s["data_hora"]) <= data_hora]
+        if not candidatos:
+            raise ValueError(f"Nenhum snapshot disponível até {data_hora.isoformat()}")
+        escolhido = candidatos[-1]
+
+        fd, descomprimido_path = tempfile.mkstemp(dir=BACKUP_DIR, suffix=".db.tmp")
+        os.close(fd)
+        try:
+            with gzip.open(os.path.join(BACKUP_DIR, escolhido["nome"]), "rb") as entrada, \
+                    open(descomprimido_path, "wb") as saida:
+                shutil.copyfileobj(entrada, saida)
+
+            # Só depois de ler o snapshot escolhido: a rotação pode removê-lo
+            seguranca = _create_snapshot_locked()
+
+            # Copia de volta pela API de backup: o banco em uso é substituído de forma transacional
+            origem = sqlite3.connect(descomprimido_path)
+            destino = sqlite3.connect(_database_path())
+            try:
+                origem.backup(destino)
+            finally:
+                destino.close()
+                origem.close()
+        finally:
+            os.remove(descomprimido_path)
+
+    logger.info(f"♻️ Banco restaurado a partir de {escolhido['nome']}")
+    return {
+        "restaurado": escolhido,
+        "snapshot_seguranca": seguranca
+    }
+
+
+class BackupScheduler:
+    """
+    Thread que cria snapshots periódicos. Com vários workers, apenas o processo que
+    obtém o lock SCHEDULER_LOCK_PATH agenda backups; os demais tentam de novo a cada ciclo
+    e assumem se o dono encerrar.
+    """
+
+    def __init__(self, interval_minutes: float = BACKUP_INTERVAL_MINUTES):
+        self.interval_seconds = interval_minutes * 60
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval_seconds <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        while not self._stop.is_set():
+            with file_lock(os.path.join(BACKUP_DIR, SCHEDULER_LOCK_PATH), blocking=False) as dono:
+                if not dono:
+                    self._stop.wait(self.interval_seconds)
+                    continue
+                while not self._stop.wait(self.interval_seconds):
+                    try:
+                        create_snapshot()
+                    except Exception as e:
+                        logger.error(f"❌ Erro ao criar snapshot do banco: {e}")
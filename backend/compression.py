@@ -0,0 +1,109 @@
+import gzip
+import os
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli  # Opcional: pip install brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1000"))  # Bytes; respostas menores vão sem compressão
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Bom equilíbrio entre CPU e tamanho para respostas dinâmicas
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """
+    Codificações aceitas pelo cliente (cabeçalho Accept-Encoding), ignorando as com q=0
+    """
+    aceitas = set()
+    for item in accept_encoding.split(","):
+        partes = [parte.strip() for parte in item.split(";")]
+        if not partes[0]:
+            continue
+        q = 1.0
+        for parametro in partes[1:]:
+            if parametro.startswith("q="):
+                try:
+                    q = float(parametro[2:])
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            aceitas.add(partes[0].lower())
+    return aceitas
+
+
+def choose_encoding(accept_encoding: str):
+    aceitas = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in aceitas:
+        return "br"
+    if "gzip" in aceitas:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI que comprime respostas com brotli (se instalado) ou gzip.
+    Só atua em respostas de corpo único, de tipo textual/JSON, acima de COMPRESSION_MIN_SIZE
+    e que ainda não tenham Content-Encoding (os estáticos já vão pré-comprimidos).
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "decidido": False}
+
+        async def send_wrapper(message):
+            if state["decidido"]:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+
+            # Primeiro pedaço do corpo: decide se comprime
+            state["decidido"] = True
+            start = state["start"]
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "")
+
+            if (
+                message.get("more_body", False)
+                or "content-encoding" in headers
+                or len(body) < self.minimum_size
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            comprimido = compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(comprimido))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": comprimido})
+
+        await self.app(scope, receive, send_wrapper)
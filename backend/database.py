@@ -1,11 +1,25 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Date
+from sqlalchemy import create_engine, event, inspect, text, select, update, delete, and_, or_, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Date, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
+import os
+
+from logic import calculate_monthly_discount_rate, calculate_cdb_monthly_return, calculate_break_even_cdi, get_recommendation
 
 # Database Setup
-DATABASE_URL = "sqlite:///./loans.db"
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./loans.db")
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+
+@event.listens_for(engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record):
+    # WAL permite leitores concorrentes com um escritor; busy_timeout faz workers
+    # esperarem o lock de escrita em vez de falharem com "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -24,11 +38,24 @@ class Emprestimo(Base):
     taxa_cdi_registro = Column(Float)
     data_cadastro = Column(String)  # ISO format YYYY-MM-DD
     dia_vencimento = Column(Integer)
+    cdi_break_even = Column(Float, index=True)  # CDI (% a.a.) em que a recomendação vira; mantido pelos eventos abaixo
     
     # Relationship to historical values
     historicos = relationship("HistoricoValorAdiantado", back_populates="emprestimo", cascade="all, delete-orphan")
 
 
+def _break_even_for(valor_parcela, valor_parcela_adiantada):
+    if valor_parcela is None or valor_parcela_adiantada is None:
+        return None
+    return calculate_break_even_cdi(calculate_monthly_discount_rate(valor_parcela, valor_parcela_adiantada))
+
+
+@event.listens_for(Emprestimo, "before_insert")
+@event.listens_for(Emprestimo, "before_update")
+def _update_cdi_break_even(mapper, connection, target):
+    target.cdi_break_even = _break_even_for(target.valor_parcela, target.valor_parcela_adiantada)
+
+
 # Database Model - Tabela Histórico de Valores Adiantados
 class HistoricoValorAdiantado(Base):
     __tablename__ = "historico_valores_adiantados"
@@ -40,9 +67,222 @@ class HistoricoValorAdiantado(Base):
     taxa_selic = Column(Float)
     taxa_cdi = Column(Float)
     
+    __table_args__ = (
+        Index("ix_historico_emprestimo_data", "emprestimo_id", "data_registro"),
+    )
+    
     # Relationship back to loan
     emprestimo = relationship("Emprestimo", back_populates="historicos")
 
 
+# Database Model - Análise derivada do histórico (taxa implícita, CDB e recomendação em cada ponto)
+class AnaliseHistorico(Base):
+    __tablename__ = "analise_historico"
+    __table_args__ = (
+        Index("ix_analise_historico_emprestimo_data", "emprestimo_id", "data_registro"),
+    )
+    
+    historico_id = Column(Integer, ForeignKey("historico_valores_adiantados.id"), primary_key=True)
+    emprestimo_id = Column(Integer, ForeignKey("emprestimos.id"), nullable=False)
+    data_registro = Column(String, nullable=False)  # ISO format YYYY-MM-DD
+    discount_monthly_percent = Column(Float)
+    cdb_monthly_return = Column(Float)
+    recommendation = Column(String)
+    virada = Column(Boolean, nullable=False, default=False)  # Recomendação mudou em relação ao ponto anterior
+
+
+# Campos do empréstimo usados em _analise_values
+ANALISE_DEPENDE_DE = ("valor_parcela", "taxa_cdi_registro")
+
+
+def _analise_values(valor_parcela, taxa_cdi_registro, valor_parcela_adiantada, taxa_cdi):
+    # Sem CDI no registro, usa o CDI cadastrado no empréstimo
+    discount_rate = calculate_monthly_discount_rate(valor_parcela, valor_parcela_adiantada)
+    cdb_return = calculate_cdb_monthly_return(taxa_cdi if taxa_cdi is not None else (taxa_cdi_registro or 0))
+    return discount_rate, cdb_return, get_recommendation(discount_rate, cdb_return)
+
+
+def _analise_rows(emprestimo_id, valor_parcela, taxa_cdi_registro, historicos):
+    """
+    Calcula as linhas de analise_historico de um empréstimo, com a flag de virada
+    
+    Args:
+        emprestimo_id: ID do empréstimo
+        valor_parcela: Valor da parcela do empréstimo
+        taxa_cdi_registro: CDI cadastrado no empréstimo (usado nos registros sem CDI)
+        historicos: (id, data_registro, valor_parcela_adiantada, taxa_cdi) ordenados por (data_registro, id)
+    
+    Returns:
+        list: Dicionários com as colunas de analise_historico
+    """
+    linhas = []
+    anterior = None
+    for historico_id, data_registro, valor_parcela_adiantada, taxa_cdi in historicos:
+        discount_rate, cdb_return, recommendation = _analise_values(
+            valor_parcela, taxa_cdi_registro, valor_parcela_adiantada, taxa_cdi
+        )
+        linhas.append({
+            "historico_id": historico_id,
+            "emprestimo_id": emprestimo_id,
+            "data_registro": data_registro,
+            "discount_monthly_percent": discount_rate,
+            "cdb_monthly_return": cdb_return,
+            "recommendation": recommendation,
+            "virada": anterior is not None and anterior != recommendation
+        })
+        anterior = recommendation
+    return linhas
+
+
+@event.listens_for(HistoricoValorAdiantado, "after_insert")
+def _insert_analise(mapper, connection, target):
+    """
+    Atualiza a análise de forma incremental: calcula só o ponto novo e corrige a flag
+    de virada do ponto seguinte (caso o registro tenha sido inserido fora de ordem)
+    """
+    analise = AnaliseHistorico.__table__
+    emprestimos = Emprestimo.__table__
+    
+    loan = connection.execute(
+        select(emprestimos.c.valor_parcela, emprestimos.c.taxa_cdi_registro).where(emprestimos.c.id == target.emprestimo_id)
+    ).first()
+    if loan is None:
+        return
+    discount_rate, cdb_return, recommendation = _analise_values(
+        loan.valor_parcela, loan.taxa_cdi_registro, target.valor_parcela_adiantada, target.taxa_cdi
+    )
+    
+    # Ordem dos pontos: (data_registro, historico_id)
+    mesmo_emprestimo = analise.c.emprestimo_id == target.emprestimo_id
+    antes = or_(
+        analise.c.data_registro < target.data_registro,
+        and_(analise.c.data_registro == target.data_registro, analise.c.historico_id < target.id)
+    )
+    depois = or_(
+        analise.c.data_registro > target.data_registro,
+        and_(analise.c.data_registro == target.data_registro, analise.c.historico_id > target.id)
+    )
+    
+    anterior = connection.execute(
+        select(analise.c.recommendation).where(mesmo_emprestimo, antes)
+        .order_by(analise.c.data_registro.desc(), analise.c.historico_id.desc()).limit(1)
+    ).scalar()
+    connection.execute(analise.insert().values(
+        historico_id=target.id,
+        emprestimo_id=target.emprestimo_id,
+        data_registro=target.data_registro,
+        discount_monthly_percent=discount_rate,
+        cdb_monthly_return=cdb_return,
+        recommendation=recommendation,
+        virada=anterior is not None and anterior != recommendation
+    ))
+    
+    seguinte = connection.execute(
+        select(analise.c.historico_id, analise.c.recommendation).where(mesmo_emprestimo, depois)
+        .order_by(analise.c.data_registro, analise.c.historico_id).limit(1)
+    ).first()
+    if seguinte is not None:
+        connection.execute(
+            update(analise).where(analise.c.historico_id == seguinte.historico_id)
+            .values(virada=seguinte.recommendation != recommendation)
+        )
+
+
+@event.listens_for(Emprestimo, "after_update")
+def _refresh_analise(mapper, connection, target):
+    """
+    A análise de cada ponto depende do valor_parcela do empréstimo e, nos registros sem CDI,
+    do taxa_cdi_registro: quando um deles muda, recalcula a análise do empréstimo
+    """
+    estado = inspect(target)
+    if any(estado.attrs[campo].history.has_changes() for campo in ANALISE_DEPENDE_DE):
+        _rebuild_analise(connection, target.id)
+
+
+def _rebuild_analise(conn, emprestimo_id):
+    """
+    Recalcula toda a análise de um empréstimo (migração de bancos antigos e mudança
+    dos dados do empréstimo usados na análise)
+    """
+    analise = AnaliseHistorico.__table__
+    historicos = HistoricoValorAdiantado.__table__
+    emprestimos = Emprestimo.__table__
+    
+    conn.execute(delete(analise).where(analise.c.emprestimo_id == emprestimo_id))
+    loan = conn.execute(
+        select(emprestimos.c.valor_parcela, emprestimos.c.taxa_cdi_registro).where(emprestimos.c.id == emprestimo_id)
+    ).first()
+    if loan is None:
+        return
+    
+    historicos_ordenados = conn.execute(
+        select(historicos.c.id, historicos.c.data_registro, historicos.c.valor_parcela_adiantada, historicos.c.taxa_cdi)
+        .where(historicos.c.emprestimo_id == emprestimo_id)
+        .order_by(historicos.c.data_registro, historicos.c.id)
+    )
+    linhas = _analise_rows(emprestimo_id, loan.valor_parcela, loan.taxa_cdi_registro, historicos_ordenados)
+    if linhas:
+        conn.execute(analise.insert(), linhas)
+
+
+# Database Model - Cache das taxas do BACEN compartilhado entre workers
+class TaxaBacenCache(Base):
+    __tablename__ = "cache_taxas_bacen"
+
+    chave = Column(String, primary_key=True)
+    selic = Column(Float)
+    cdi = Column(Float)
+    data_atualizacao = Column(String)  # ISO format, quando a API do BACEN foi consultada
+    consultado_em = Column(Float, nullable=False)  # Epoch, usado para expirar o cache
+
+
+_db_initialized = False
+
+
 def init_db():
+    """
+    Cria as tabelas que ainda não existem. A verificação do schema roda uma única vez por processo.
+    """
+    global _db_initialized
+    if _db_initialized:
+        return
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        _migrate_schema(conn)
+    _db_initialized = True
+
+
+def _migrate_schema(conn):
+    """
+    Adiciona colunas novas a bancos criados por versões anteriores e preenche os valores derivados
+    """
+    colunas = {coluna["name"] for coluna in inspect(conn).get_columns("emprestimos")}
+    if "cdi_break_even" not in colunas:
+        conn.execute(text("ALTER TABLE emprestimos ADD COLUMN cdi_break_even FLOAT"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_emprestimos_cdi_break_even ON emprestimos (cdi_break_even)"))
+    
+    pendentes = conn.execute(text(
+        "SELECT id, valor_parcela, valor_parcela_adiantada FROM emprestimos WHERE cdi_break_even IS NULL"
+    )).fetchall()
+    if pendentes:
+        conn.execute(
+            text("UPDATE emprestimos SET cdi_break_even = :cdi_break_even WHERE id = :id"),
+            [
+                {"id": loan_id, "cdi_break_even": _break_even_for(valor_parcela, valor_parcela_adiantada)}
+                for loan_id, valor_parcela, valor_parcela_adiantada in pendentes
+            ]
+        )
+    
+    # Índice do gráfico de evolução (create_all não cria índices em tabelas já existentes)
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_historico_emprestimo_data "
+        "ON historico_valores_adiantados (emprestimo_id, data_registro)"
+    ))
+    
+    # Históricos sem análise (bancos anteriores à tabela analise_historico)
+    sem_analise = conn.execute(text(
+        "SELECT DISTINCT h.emprestimo_id FROM historico_valores_adiantados h "
+        "LEFT JOIN analise_historico a ON a.historico_id = h.id WHERE a.historico_id IS NULL"
+    )).scalars().all()
+    for emprestimo_id in sem_analise:
+        _rebuild_analise(conn, emprestimo_id)
@@ -0,0 +1,110 @@
+from datetime import date, timedelta
+
+BUCKETS = ("day", "week", "month")
+
+
+def bucket_start(data_registro: str, bucket: str) -> str:
+    """
+    Retorna a data inicial (ISO) do intervalo ao qual o registro pertence
+
+    Args:
+        data_registro: Data ISO (YYYY-MM-DD, com ou sem horário)
+        bucket: "day", "week" (semana começando na segunda) ou "month"
+    """
+    dia = data_registro[:10]
+    if bucket == "day":
+        return dia
+    if bucket == "month":
+        return dia[:8] + "01"
+    d = date.fromisoformat(dia)
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+
+def aggregate_buckets(pontos, bucket: str):
+    """
+    Agrega pontos já ordenados por data em intervalos, em uma única passada.
+    Cada intervalo vira um ponto com o último valor e o mínimo/máximo do período.
+
+    Args:
+        pontos: Iterável de dicts com data_registro, valor_parcela_adiantada, taxa_selic, taxa_cdi
+        bucket: "day", "week" ou "month"
+
+    Yields:
+        dict: Ponto agregado (data_registro é o início do intervalo)
+    """
+    atual = None
+    for ponto in pontos:
+        chave = bucket_start(ponto["data_registro"], bucket)
+        valor = ponto["valor_parcela_adiantada"]
+        if atual is not None and atual["data_registro"] == chave:
+            atual["valor_parcela_adiantada"] = valor
+            atual["valor_min"] = min(atual["valor_min"], valor)
+            atual["valor_max"] = max(atual["valor_max"], valor)
+            atual["taxa_selic"] = ponto["taxa_selic"]
+            atual["taxa_cdi"] = ponto["taxa_cdi"]
+            continue
+        if atual is not None:
+            yield atual
+        atual = {
+            "data_registro": chave,
+            "valor_parcela_adiantada": valor,
+            "valor_min": valor,
+            "valor_max": valor,
+            "taxa_selic": ponto["taxa_selic"],
+            "taxa_cdi": ponto["taxa_cdi"]
+        }
+    if atual is not None:
+        yield atual
+
+
+def lttb(pontos, alvo: int):
+    """
+    Largest-Triangle-Three-Buckets: reduz uma série a `alvo` pontos preservando a forma visual
+    (mantém o primeiro e o último ponto e, em cada intervalo, o que forma o maior triângulo)
+
+    Args:
+        pontos: Lista de dicts ordenada por data_registro
+        alvo: Número de pontos desejado (>= 3)
+
+    Returns:
+        list: Subconjunto de `pontos`
+    """
+    n = len(pontos)
+    if alvo >= n or alvo < 3:
+        return list(pontos)
+
+    xs = [date.fromisoformat(p["data_registro"][:10]).toordinal() for p in pontos]
+    ys = [p["valor_parcela_adiantada"] for p in pontos]
+
+    selecionados = [pontos[0]]
+    tamanho = (n - 2) / (alvo - 2)
+    a = 0
+    for i in range(alvo - 2):
+        inicio = int(i * tamanho) + 1
+        fim = int((i + 1) * tamanho) + 1
+
+        # Média do próximo intervalo (ou o último ponto, no final)
+        prox_inicio = fim
+        prox_fim = min(int((i + 2) * tamanho) + 1, n)
+        if prox_inicio >= n - 1:
+            media_x, media_y = xs[-1], ys[-1]
+        else:
+            quantidade = prox_fim - prox_inicio
+            media_x = sum(xs[prox_inicio:prox_fim]) / quantidade
+            media_y = sum(ys[prox_inicio:prox_fim]) / quantidade
+
+        maior_area = -1.0
+        escolhido = inicio
+        for j in range(inicio, fim):
+            area = abs(
+                (xs[a] - media_x) * (ys[j] - ys[a])
+                - (xs[a] - xs[j]) * (media_y - ys[a])
+            )
+            if area > maior_area:
+                maior_area = area
+                escolhido = j
+        selecionados.append(pontos[escolhido])
+        a = escolhido
+
+    selecionados.append(pontos[-1])
+    return selecionados
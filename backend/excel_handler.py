@@ -1,22 +1,28 @@
-from openpyxl import Workbook, load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment
-from datetime import datetime
+from datetime import datetime, date
 from pathlib import Path
 import os
 
+from file_utils import atomic_write_path, file_lock, lock_path
+
 EXCEL_FILE_PATH = "emprestimos_backup.xlsx"
+EXCEL_LOCK_NAME = "excel_sync.lock"
 
-def export_loans_to_excel(emprestimos, historicos=None):
+def export_loans_to_excel(emprestimos, historicos=None, file_path=EXCEL_FILE_PATH):
     """
     Exporta empréstimos e histórico para arquivo Excel
     
     Args:
         emprestimos: Lista de objetos Emprestimo
         historicos: Lista de objetos HistoricoValorAdiantado (opcional)
+        file_path: Caminho de destino (padrão: arquivo de backup)
     
     Returns:
         str: Caminho do arquivo Excel gerado
     """
+    # openpyxl é pesado; importado apenas no primeiro uso
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+
     wb = Workbook()
     
     # Aba de Empréstimos
@@ -105,9 +111,10 @@ def export_loans_to_excel(emprestimos, historicos=None):
             adjusted_width = min(max_length + 2, 50)
             ws_history.column_dimensions[column_letter].width = adjusted_width
     
-    # Salvar arquivo
-    wb.save(EXCEL_FILE_PATH)
-    return EXCEL_FILE_PATH
+    # Salvar em arquivo temporário e renomear, para leitores nunca verem um arquivo incompleto
+    with atomic_write_path(file_path) as temp_path:
+        wb.save(temp_path)
+    return file_path
 
 
 def auto_sync_to_excel(db):
@@ -120,15 +127,45 @@ def auto_sync_to_excel(db):
     from database import Emprestimo, HistoricoValorAdiantado
     
     try:
-        emprestimos = db.query(Emprestimo).all()
-        historicos = db.query(HistoricoValorAdiantado).all()
-        
-        export_loans_to_excel(emprestimos, historicos)
+        # Lock entre processos: com vários workers, um sincroniza por vez e sempre
+        # lê o estado mais recente do banco depois de adquirir o lock
+        with file_lock(lock_path(EXCEL_LOCK_NAME)):
+            emprestimos = db.query(Emprestimo).all()
+            historicos = db.query(HistoricoValorAdiantado).all()
+            
+            export_loans_to_excel(emprestimos, historicos)
         print(f"✅ Sincronização automática realizada: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     except Exception as e:
         print(f"❌ Erro na sincronização automática: {str(e)}")
 
 
+def auto_sync_to_excel_background():
+    """
+    Sincroniza o Excel com uma sessão própria, para rodar como tarefa em segundo plano
+    depois que a resposta da requisição já foi enviada
+    """
+    from database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        auto_sync_to_excel(db)
+    finally:
+        db.close()
+
+
+def _to_iso_date(value):
+    """
+    Converte datas lidas pelo openpyxl (datetime/date) de volta para string ISO, como guardado no banco
+    """
+    if isinstance(value, datetime):
+        if value.hour == value.minute == value.second == value.microsecond == 0:
+            return value.date().isoformat()
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
 def import_loans_from_excel(file_path, db):
     """
     Importa empréstimos do arquivo Excel para o banco de dados
@@ -141,6 +178,7 @@ def import_loans_from_excel(file_path, db):
         dict: Resultado da importação com contadores
     """
     from database import Emprestimo, HistoricoValorAdiantado
+    from openpyxl import load_workbook
     
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Arquivo não encontrado: {file_path}")
@@ -171,11 +209,12 @@ def import_loans_from_excel(file_path, db):
                 existing.qtd_parcelas_devidas = row[6]
                 existing.taxa_selic_registro = row[7]
                 existing.taxa_cdi_registro = row[8]
-                existing.data_cadastro = row[9]
+                existing.data_cadastro = _to_iso_date(row[9])
                 existing.dia_vencimento = row[10]
             else:
                 # Criar novo empréstimo
                 new_loan = Emprestimo(
+                    id=row[0],  # Preserva o ID para manter o vínculo com o histórico
                     descricao=row[1],
                     instituicao_credora=row[2],
                     valor_parcela=row[3],
@@ -184,7 +223,7 @@ def import_loans_from_excel(file_path, db):
                     qtd_parcelas_devidas=row[6],
                     taxa_selic_registro=row[7],
                     taxa_cdi_registro=row[8],
-                    data_cadastro=row[9],
+                    data_cadastro=_to_iso_date(row[9]),
                     dia_vencimento=row[10]
                 )
                 db.add(new_loan)
@@ -206,8 +245,9 @@ def import_loans_from_excel(file_path, db):
             
             if not existing:
                 new_history = HistoricoValorAdiantado(
+                    id=row[0],
                     emprestimo_id=row[1],
-                    data_registro=row[2],
+                    data_registro=_to_iso_date(row[2]),
                     valor_parcela_adiantada=row[3],
                     taxa_selic=row[4],
                     taxa_cdi=row[5]
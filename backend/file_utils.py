@@ -0,0 +1,114 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+LOCK_DIR = os.environ.get("LOCK_DIR")  # Padrão: diretório do banco SQLite
+
+
+def lock_path(name):
+    """
+    Caminho de um arquivo de lock compartilhado entre os workers: em LOCK_DIR, se definido,
+    senão ao lado do banco SQLite (e não no diretório de trabalho atual)
+
+    Args:
+        name: Nome do arquivo de lock
+
+    Returns:
+        str: Caminho absoluto do arquivo
+    """
+    directory = LOCK_DIR
+    if directory is None:
+        from database import engine
+        directory = os.path.dirname(os.path.abspath(engine.url.database or "."))
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+
+@contextmanager
+def file_lock(lock_path, blocking=True):
+    """
+    Lock exclusivo entre processos baseado em arquivo (fcntl no Linux/macOS, msvcrt no Windows)
+
+    Args:
+        lock_path: Caminho do arquivo de lock (criado se não existir)
+        blocking: Se False, não espera o lock ficar livre
+
+    Yields:
+        bool: True se o lock foi adquirido (sempre True quando blocking=True)
+    """
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        acquired = _lock(fd, blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(fd, blocking):
+        os.lseek(fd, 0, os.SEEK_SET)
+        if not blocking:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                return False
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return True
+            except OSError:
+                # LK_LOCK desiste após ~10 s; tenta de novo até conseguir
+                continue
+
+    def _unlock(fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(fd, blocking):
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(fd, flags)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@contextmanager
+def atomic_write_path(final_path):
+    """
+    Fornece um caminho temporário no mesmo diretório do destino e, se o bloco terminar
+    sem erro, substitui o destino de forma atômica (os.replace). Leitores nunca veem
+    um arquivo pela metade.
+
+    Args:
+        final_path: Caminho definitivo do arquivo
+
+    Yields:
+        str: Caminho temporário onde o arquivo deve ser escrito
+    """
+    directory = os.path.dirname(os.path.abspath(final_path))
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory,
+        prefix=f".{os.path.basename(final_path)}.",
+        suffix=".tmp"
+    )
+    os.close(fd)
+    try:
+        yield temp_path
+        os.replace(temp_path, final_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
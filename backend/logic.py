@@ -1,3 +1,6 @@
+import heapq
+
+
 def calculate_monthly_discount_rate(valor_parcela: float, valor_parcela_adiantada: float) -> float:
     """
     Calculates the monthly discount percentage when prepaying.
@@ -16,6 +19,15 @@ def calculate_cdb_monthly_return(taxa_cdi: float) -> float:
     taxa_mensal_cdb = ((1 + taxa_anual_cdb / 100) ** (1/12) - 1) * 100
     return taxa_mensal_cdb
 
+def calculate_break_even_cdi(discount_rate: float) -> float:
+    """
+    Annual CDI (%) at which the CDB monthly return equals the given monthly discount rate.
+    Inverse of calculate_cdb_monthly_return: below this CDI prepaying wins, at or above it investing wins.
+    Formula: ((1 + discount / 100) ^ 12 - 1) * 100 / 1.05
+    """
+    taxa_anual_cdb = ((1 + discount_rate / 100) ** 12 - 1) * 100
+    return taxa_anual_cdb / 1.05  # 105% do CDI
+
 def get_recommendation(discount_rate: float, cdb_return: float) -> str:
     """
     Returns a recommendation based on the comparison between discount rate and CDB return.
@@ -50,3 +62,67 @@ def calculate_remaining_installments(data_cadastro, qtd_total_parcelas: int, dia
     
     # Ensure we don't return negative values
     return max(0, remaining)
+
+
+def optimize_prepayment(loans, orcamento: float, taxa_cdi: float) -> dict:
+    """
+    Distributes a cash budget across the remaining installments of every loan,
+    prepaying first the installments with the highest implied monthly return.
+    
+    Every remaining installment of a loan has the same implied return (the discount
+    rate of that loan), so the heap holds one entry per loan and the greedy step takes
+    as many installments of the best loan as the budget allows. Only installments whose
+    return beats the CDB (recommendation "Adiantar") are considered.
+    
+    Args:
+        loans: iterable of (id, descricao, valor_parcela, valor_parcela_adiantada, qtd_parcelas_devidas)
+        orcamento: float - cash available for prepayment
+        taxa_cdi: float - current annual CDI rate (%)
+    
+    Returns:
+        dict - allocation plan ordered by return, with totals
+    """
+    cdb_return = calculate_cdb_monthly_return(taxa_cdi)
+    
+    heap = []
+    for loan_id, descricao, valor_parcela, valor_parcela_adiantada, qtd_parcelas_devidas in loans:
+        if not qtd_parcelas_devidas or not valor_parcela_adiantada or valor_parcela_adiantada <= 0:
+            continue
+        discount_rate = calculate_monthly_discount_rate(valor_parcela, valor_parcela_adiantada)
+        if get_recommendation(discount_rate, cdb_return) != "Adiantar":
+            continue
+        # Highest return first; among equal returns, cheaper installments first
+        heap.append((-discount_rate, valor_parcela_adiantada, loan_id, descricao, valor_parcela, qtd_parcelas_devidas))
+    heapq.heapify(heap)
+    
+    saldo = orcamento
+    plano = []
+    total_economy = 0.0
+    while heap and saldo > 0:
+        neg_rate, valor_parcela_adiantada, loan_id, descricao, valor_parcela, qtd_parcelas_devidas = heapq.heappop(heap)
+        # Small tolerance so float noise does not drop an installment that fits exactly
+        parcelas = min(qtd_parcelas_devidas, int((saldo + 1e-9) // valor_parcela_adiantada))
+        if parcelas == 0:
+            continue
+        
+        valor_adiantado = parcelas * valor_parcela_adiantada
+        economia = parcelas * (valor_parcela - valor_parcela_adiantada)
+        saldo -= valor_adiantado
+        total_economy += economia
+        plano.append({
+            "emprestimo_id": loan_id,
+            "descricao": descricao,
+            "discount_monthly_percent": -neg_rate,
+            "parcelas_adiantar": parcelas,
+            "valor_adiantado": round(valor_adiantado, 2),
+            "economia": round(economia, 2)
+        })
+    
+    return {
+        "cdb_monthly_return": cdb_return,
+        "orcamento": orcamento,
+        "total_investido": round(orcamento - saldo, 2),
+        "saldo_restante": round(max(saldo, 0.0), 2),
+        "total_economy": round(total_economy, 2),
+        "plano": plano
+    }
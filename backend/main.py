@@ -1,24 +1,62 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, BackgroundTasks
 from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
 
-from database import SessionLocal, engine, Emprestimo, HistoricoValorAdiantado, init_db
-from logic import calculate_monthly_discount_rate, calculate_cdb_monthly_return, get_recommendation, calculate_remaining_installments
+from database import SessionLocal, engine, Emprestimo, HistoricoValorAdiantado, AnaliseHistorico, init_db
+from logic import calculate_monthly_discount_rate, calculate_cdb_monthly_return, get_recommendation, calculate_remaining_installments, optimize_prepayment
 from bacen_api import BacenAPI
-from excel_handler import export_loans_to_excel, import_loans_from_excel, auto_sync_to_excel
+from excel_handler import export_loans_to_excel, import_loans_from_excel, auto_sync_to_excel_background
+from downsampling import BUCKETS, aggregate_buckets, lttb
+from monte_carlo import calibrate, run_monte_carlo, shutdown_pool as shutdown_monte_carlo_pool
+from backup import BackupScheduler, create_snapshot, list_snapshots, restore_snapshot
+from profiler import ProfiledRoute, ProfilingMiddleware, install_sql_listeners, profiling_enabled, require_admin, list_profiles, get_profile, clear_profiles
+from contextlib import asynccontextmanager
 from datetime import datetime
+from itertools import groupby
+import logging
 import os
+import tempfile
 
-from fastapi.staticfiles import StaticFiles
-import os
+from compression import CompressionMiddleware
+from static_assets import CachedStaticFiles, build_static_assets
+
+
+frontend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "frontend"))
+static_build_path = os.environ.get(
+    "STATIC_BUILD_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "frontend_build"))
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Inicialização do app: configura logging e verifica o schema do banco uma única vez
+    """
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    build_static_assets(frontend_path, static_build_path)
+    backup_scheduler = BackupScheduler()
+    backup_scheduler.start()
+    yield
+    backup_scheduler.stop()
+    shutdown_monte_carlo_pool()
+
+
+app = FastAPI(title="Debt Management API", lifespan=lifespan)
 
-# Initialize Database
-init_db()
+# Profiling sob demanda (cabeçalho X-Debug-Profile ou requisições lentas), só com ADMIN_TOKEN definido
+if profiling_enabled():
+    app.router.route_class = ProfiledRoute  # Deve vir antes da declaração das rotas
+    install_sql_listeners(engine)
+    app.add_middleware(ProfilingMiddleware)
 
-app = FastAPI(title="Debt Management API")
+# Compressão (brotli se disponível, senão gzip) para respostas grandes da API
+app.add_middleware(CompressionMiddleware)
 
 # CORS - Allow all origins including file://
 app.add_middleware(
@@ -31,6 +69,15 @@ app.add_middleware(
 
 
 
+# Sincronização do Excel (cópia para leitura humana) fora do caminho da requisição
+EXCEL_AUTO_SYNC = os.environ.get("EXCEL_AUTO_SYNC", "1") == "1"
+
+
+def schedule_excel_sync(background_tasks: BackgroundTasks):
+    if EXCEL_AUTO_SYNC:
+        background_tasks.add_task(auto_sync_to_excel_background)
+
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -74,6 +121,21 @@ class HistoricoCreate(BaseModel):
     taxa_selic: float = None
     taxa_cdi: float = None
 
+class OtimizacaoRequest(BaseModel):
+    orcamento: float
+    taxa_cdi: float
+
+class MonteCarloRequest(BaseModel):
+    n_caminhos: int = 10000
+    seed: Optional[int] = None
+    cdi_inicial: Optional[float] = None          # Padrão: último CDI registrado
+    media: Optional[float] = None                # Padrão: estimada do histórico
+    reversao_mensal: Optional[float] = None
+    volatilidade_mensal: Optional[float] = None
+
+class RestoreRequest(BaseModel):
+    data_hora: datetime  # ISO 8601; sem fuso, é interpretado no horário local do servidor
+
 class HistoricoResponse(BaseModel):
     id: int
     emprestimo_id: int
@@ -87,14 +149,14 @@ class HistoricoResponse(BaseModel):
 
 # Routes
 @app.post("/loans", response_model=EmprestimoResponse)
-def create_loan(emprestimo: EmprestimoCreate, db: Session = Depends(get_db)):
+def create_loan(emprestimo: EmprestimoCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     db_emprestimo = Emprestimo(**emprestimo.dict())
     db.add(db_emprestimo)
     db.commit()
     db.refresh(db_emprestimo)
     
-    # Sincronização automática para Excel
-    auto_sync_to_excel(db)
+    # Sincronização automática para Excel (após enviar a resposta)
+    schedule_excel_sync(background_tasks)
     
     # Calculate computed fields for response
     discount_rate = calculate_monthly_discount_rate(db_emprestimo.valor_parcela, db_emprestimo.valor_parcela_adiantada)
@@ -164,8 +226,133 @@ def simulate_loan(emprestimo: EmprestimoCreate):
         "payoff_amount": emprestimo.valor_parcela_adiantada * emprestimo.qtd_parcelas_devidas
     }
 
+@app.post("/otimizador/adiantamento")
+def optimize_loans_prepayment(otimizacao: OtimizacaoRequest, db: Session = Depends(get_db)):
+    """
+    Distribui um orçamento entre as parcelas restantes de todos os empréstimos,
+    adiantando primeiro as de maior retorno implícito acima do CDB
+    """
+    if otimizacao.orcamento <= 0:
+        raise HTTPException(status_code=400, detail="Orçamento deve ser maior que zero")
+    
+    # Só as colunas necessárias: evita montar objetos ORM para carteiras grandes
+    loans = db.query(
+        Emprestimo.id,
+        Emprestimo.descricao,
+        Emprestimo.valor_parcela,
+        Emprestimo.valor_parcela_adiantada,
+        Emprestimo.qtd_parcelas_devidas
+    ).filter(Emprestimo.qtd_parcelas_devidas > 0)
+    
+    return optimize_prepayment(loans, otimizacao.orcamento, otimizacao.taxa_cdi)
+
+MARGEM_CDI_BREAK_EVEN = 1e-9  # Pontos percentuais de CDI
+
+@app.get("/simulacao/cdi")
+def simulate_cdi_change(cdi_atual: float, cdi_novo: float, db: Session = Depends(get_db)):
+    """
+    Quais empréstimos mudam de recomendação se o CDI for de `cdi_atual` para `cdi_novo`.
+    Usa o índice de CDI de equilíbrio (cdi_break_even): só os empréstimos cujo equilíbrio
+    está entre as duas taxas são lidos, sem percorrer a carteira inteira.
+    """
+    limite_inferior, limite_superior = sorted((cdi_atual, cdi_novo))
+    cdb_atual = calculate_cdb_monthly_return(cdi_atual)
+    cdb_novo = calculate_cdb_monthly_return(cdi_novo)
+    
+    candidatos = db.query(
+        Emprestimo.id,
+        Emprestimo.descricao,
+        Emprestimo.valor_parcela,
+        Emprestimo.valor_parcela_adiantada,
+        Emprestimo.qtd_parcelas_devidas,
+        Emprestimo.cdi_break_even
+    ).filter(
+        # Margem nas bordas: com o CDI igual ao equilíbrio, o arredondamento decide o lado;
+        # os candidatos que não viram de fato são descartados abaixo
+        Emprestimo.cdi_break_even > limite_inferior - MARGEM_CDI_BREAK_EVEN,
+        Emprestimo.cdi_break_even <= limite_superior + MARGEM_CDI_BREAK_EVEN
+    ).order_by(Emprestimo.cdi_break_even)
+    
+    viradas = []
+    variacao_economia = 0.0
+    for loan_id, descricao, valor_parcela, valor_parcela_adiantada, qtd_parcelas_devidas, cdi_break_even in candidatos:
+        discount_rate = calculate_monthly_discount_rate(valor_parcela, valor_parcela_adiantada)
+        recomendacao_atual = get_recommendation(discount_rate, cdb_atual)
+        recomendacao_nova = get_recommendation(discount_rate, cdb_novo)
+        if recomendacao_atual == recomendacao_nova:
+            continue  # Candidato da margem da borda que não vira
+        
+        total_economy = (valor_parcela - valor_parcela_adiantada) * qtd_parcelas_devidas
+        variacao_economia += total_economy if recomendacao_nova == "Adiantar" else -total_economy
+        viradas.append({
+            "emprestimo_id": loan_id,
+            "descricao": descricao,
+            "cdi_break_even": cdi_break_even,
+            "discount_monthly_percent": discount_rate,
+            "recommendation_atual": recomendacao_atual,
+            "recommendation_nova": recomendacao_nova,
+            "total_potential_economy": total_economy
+        })
+    
+    return {
+        "cdi_atual": cdi_atual,
+        "cdi_novo": cdi_novo,
+        "cdb_monthly_return_atual": cdb_atual,
+        "cdb_monthly_return_novo": cdb_novo,
+        "total_viradas": len(viradas),
+        "variacao_economia": variacao_economia,
+        "viradas": viradas
+    }
+
+MAX_CAMINHOS_MONTE_CARLO = 100000
+
+@app.post("/simulacao/monte-carlo")
+def simulate_monte_carlo(simulacao: MonteCarloRequest, db: Session = Depends(get_db)):
+    """
+    Simula Adiantar vs Investir sob incerteza do CDI: gera caminhos de CDI com reversão à média
+    (calibrada com os CDIs registrados) e retorna, por empréstimo, a probabilidade de adiantar
+    ser vantajoso e os percentis da economia
+    """
+    if not 0 < simulacao.n_caminhos <= MAX_CAMINHOS_MONTE_CARLO:
+        raise HTTPException(status_code=400, detail=f"n_caminhos deve estar entre 1 e {MAX_CAMINHOS_MONTE_CARLO}")
+    
+    serie_cdi = db.query(HistoricoValorAdiantado.data_registro, HistoricoValorAdiantado.taxa_cdi).filter(
+        HistoricoValorAdiantado.taxa_cdi.isnot(None)
+    ).all()
+    serie_cdi += db.query(Emprestimo.data_cadastro, Emprestimo.taxa_cdi_registro).filter(
+        Emprestimo.taxa_cdi_registro.isnot(None)
+    ).all()
+    
+    modelo = calibrate(serie_cdi)
+    if modelo is None:
+        if simulacao.cdi_inicial is None:
+            raise HTTPException(status_code=400, detail="Sem CDI registrado: informe cdi_inicial")
+        modelo = calibrate([("", simulacao.cdi_inicial)])
+    for campo in ("cdi_inicial", "media", "reversao_mensal", "volatilidade_mensal"):
+        valor = getattr(simulacao, campo)
+        if valor is not None:
+            modelo[campo] = valor
+    
+    loans = db.query(
+        Emprestimo.id,
+        Emprestimo.descricao,
+        Emprestimo.valor_parcela,
+        Emprestimo.valor_parcela_adiantada,
+        Emprestimo.qtd_parcelas_devidas
+    ).filter(Emprestimo.qtd_parcelas_devidas > 0).all()
+    
+    try:
+        resultados = run_monte_carlo(loans, modelo, simulacao.n_caminhos, simulacao.seed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "modelo": {**modelo, "n_caminhos": simulacao.n_caminhos},
+        "emprestimos": resultados
+    }
+
 @app.patch("/loans/{loan_id}", response_model=EmprestimoResponse)
-def update_loan(loan_id: int, emprestimo_update: EmprestimoUpdate, db: Session = Depends(get_db)):
+def update_loan(loan_id: int, emprestimo_update: EmprestimoUpdate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     db_emprestimo = db.query(Emprestimo).filter(Emprestimo.id == loan_id).first()
     if not db_emprestimo:
         raise HTTPException(status_code=404, detail="Loan not found")
@@ -193,8 +380,8 @@ def update_loan(loan_id: int, emprestimo_update: EmprestimoUpdate, db: Session =
     db.commit()
     db.refresh(db_emprestimo)
     
-    # Sincronização automática para Excel
-    auto_sync_to_excel(db)
+    # Sincronização automática para Excel (após enviar a resposta)
+    schedule_excel_sync(background_tasks)
     
     # Calculate computed fields for response
     discount_rate = calculate_monthly_discount_rate(db_emprestimo.valor_parcela, db_emprestimo.valor_parcela_adiantada)
@@ -212,11 +399,11 @@ def update_loan(loan_id: int, emprestimo_update: EmprestimoUpdate, db: Session =
     }
 
 @app.get("/taxas/atuais")
-def get_taxas_atuais():
+def get_taxas_atuais(db: Session = Depends(get_db)):
     """
-    Busca as taxas SELIC e CDI atuais diretamente da API do Banco Central (BACEN)
+    Busca as taxas SELIC e CDI atuais da API do Banco Central (BACEN), com cache compartilhado no banco
     """
-    taxas = BacenAPI.buscar_taxas_atuais()
+    taxas = BacenAPI.buscar_taxas_com_cache(db)
     return {
         "selic": taxas.get("selic"),
         "cdi": taxas.get("cdi"),
@@ -225,7 +412,7 @@ def get_taxas_atuais():
 
 # Histórico de Valores Adiantados - Endpoints
 @app.post("/loans/{loan_id}/historico", response_model=HistoricoResponse)
-def create_historico(loan_id: int, historico: HistoricoCreate, db: Session = Depends(get_db)):
+def create_historico(loan_id: int, historico: HistoricoCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Registra um novo valor de parcela adiantada para um empréstimo em uma data específica
     """
@@ -243,8 +430,8 @@ def create_historico(loan_id: int, historico: HistoricoCreate, db: Session = Dep
     db.commit()
     db.refresh(db_historico)
     
-    # Sincronização automática para Excel
-    auto_sync_to_excel(db)
+    # Sincronização automática para Excel (após enviar a resposta)
+    schedule_excel_sync(background_tasks)
     
     return db_historico
 
@@ -264,32 +451,98 @@ def get_loan_historico(loan_id: int, db: Session = Depends(get_db)):
     return historicos
 
 @app.get("/historico/all")
-def get_all_historico(db: Session = Depends(get_db)):
+def get_all_historico(pontos: Optional[int] = None, bucket: Optional[str] = None, db: Session = Depends(get_db)):
     """
     Busca todos os históricos de todos os empréstimos para gerar o gráfico de evolução
     Retorna dados agrupados por empréstimo
+    
+    Parâmetros opcionais para limitar o tamanho do gráfico:
+        bucket: "day", "week" ou "month" - agrega cada intervalo (último valor, mínimo e máximo)
+        pontos: número máximo de pontos por empréstimo (redução com LTTB)
     """
-    emprestimos = db.query(Emprestimo).all()
-    result = []
+    if bucket is not None and bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket deve ser um de: {', '.join(BUCKETS)}")
+    if pontos is not None and pontos < 3:
+        raise HTTPException(status_code=400, detail="pontos deve ser no mínimo 3")
     
-    for emprestimo in emprestimos:
-        historicos = db.query(HistoricoValorAdiantado).filter(
-            HistoricoValorAdiantado.emprestimo_id == emprestimo.id
-        ).order_by(HistoricoValorAdiantado.data_registro).all()
+    # Uma única consulta, lida em ordem do índice (emprestimo_id, data_registro)
+    query = db.query(
+        HistoricoValorAdiantado.emprestimo_id,
+        Emprestimo.descricao,
+        HistoricoValorAdiantado.data_registro,
+        HistoricoValorAdiantado.valor_parcela_adiantada,
+        HistoricoValorAdiantado.taxa_selic,
+        HistoricoValorAdiantado.taxa_cdi
+    ).join(
+        Emprestimo, Emprestimo.id == HistoricoValorAdiantado.emprestimo_id
+    ).order_by(
+        HistoricoValorAdiantado.emprestimo_id,
+        HistoricoValorAdiantado.data_registro,
+        HistoricoValorAdiantado.id
+    ).yield_per(1000)
+    
+    result = []
+    for (emprestimo_id, emprestimo_nome), linhas in groupby(query, key=lambda linha: (linha[0], linha[1])):
+        historicos = (
+            {
+                "data_registro": data_registro,
+                "valor_parcela_adiantada": valor_parcela_adiantada,
+                "taxa_selic": taxa_selic,
+                "taxa_cdi": taxa_cdi
+            } for _, _, data_registro, valor_parcela_adiantada, taxa_selic, taxa_cdi in linhas
+        )
+        if bucket is not None:
+            historicos = aggregate_buckets(historicos, bucket)
+        historicos = list(historicos)
+        if pontos is not None:
+            historicos = lttb(historicos, pontos)
         
-        if historicos:  # Só inclui se houver histórico
+        result.append({
+            "emprestimo_id": emprestimo_id,
+            "emprestimo_nome": emprestimo_nome,
+            "historicos": historicos
+        })
+    
+    return result
+
+@app.get("/historico/analise")
+def get_historico_analise(emprestimo_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Série histórica derivada por empréstimo: taxa implícita de desconto vs rendimento do CDB,
+    recomendação em cada ponto e as datas em que a recomendação virou
+    """
+    query = db.query(AnaliseHistorico, Emprestimo.descricao).join(
+        Emprestimo, Emprestimo.id == AnaliseHistorico.emprestimo_id
+    )
+    if emprestimo_id is not None:
+        query = query.filter(AnaliseHistorico.emprestimo_id == emprestimo_id)
+    query = query.order_by(AnaliseHistorico.emprestimo_id, AnaliseHistorico.data_registro, AnaliseHistorico.historico_id)
+    
+    result = []
+    anterior = None
+    for analise, descricao in query:
+        if not result or result[-1]["emprestimo_id"] != analise.emprestimo_id:
             result.append({
-                "emprestimo_id": emprestimo.id,
-                "emprestimo_nome": emprestimo.descricao,
-                "historicos": [
-                    {
-                        "data_registro": h.data_registro,
-                        "valor_parcela_adiantada": h.valor_parcela_adiantada,
-                        "taxa_selic": h.taxa_selic,
-                        "taxa_cdi": h.taxa_cdi
-                    } for h in historicos
-                ]
+                "emprestimo_id": analise.emprestimo_id,
+                "emprestimo_nome": descricao,
+                "pontos": [],
+                "viradas": []
             })
+            anterior = None
+        serie = result[-1]
+        serie["pontos"].append({
+            "data_registro": analise.data_registro,
+            "discount_monthly_percent": analise.discount_monthly_percent,
+            "cdb_monthly_return": analise.cdb_monthly_return,
+            "recommendation": analise.recommendation
+        })
+        if analise.virada:
+            serie["viradas"].append({
+                "data_registro": analise.data_registro,
+                "de": anterior,
+                "para": analise.recommendation
+            })
+        anterior = analise.recommendation
     
     return result
 
@@ -300,29 +553,37 @@ def export_to_excel(db: Session = Depends(get_db)):
     """
     Exporta todos os empréstimos e histórico para arquivo Excel
     """
+    # Arquivo temporário exclusivo por requisição; removido depois do envio
+    fd, file_path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
     try:
         emprestimos = db.query(Emprestimo).all()
         historicos = db.query(HistoricoValorAdiantado).all()
         
-        file_path = export_loans_to_excel(emprestimos, historicos)
+        export_loans_to_excel(emprestimos, historicos, file_path=file_path)
         
         return FileResponse(
             path=file_path,
             filename="emprestimos_backup.xlsx",
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            background=BackgroundTask(os.remove, file_path)
         )
     except Exception as e:
+        if os.path.exists(file_path):
+            os.remove(file_path)
         raise HTTPException(status_code=500, detail=f"Erro ao exportar para Excel: {str(e)}")
 
 
 @app.post("/import/excel")
-async def import_from_excel(file: UploadFile = File(...), db: Session = Depends(get_db)):
+async def import_from_excel(background_tasks: BackgroundTasks, file: UploadFile = File(...), db: Session = Depends(get_db)):
     """
     Importa empréstimos e histórico de arquivo Excel
     """
+    # Caminho temporário exclusivo: uploads simultâneos com o mesmo nome não colidem
+    fd, temp_file_path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
     try:
         # Salvar arquivo temporariamente
-        temp_file_path = f"temp_{file.filename}"
         with open(temp_file_path, "wb") as buffer:
             content = await file.read()
             buffer.write(content)
@@ -334,7 +595,7 @@ async def import_from_excel(file: UploadFile = File(...), db: Session = Depends(
         os.remove(temp_file_path)
         
         # Sincronizar automaticamente após importação
-        auto_sync_to_excel(db)
+        schedule_excel_sync(background_tasks)
         
         return {
             "message": "Dados importados com sucesso",
@@ -348,6 +609,60 @@ async def import_from_excel(file: UploadFile = File(...), db: Session = Depends(
         raise HTTPException(status_code=500, detail=f"Erro ao importar do Excel: {str(e)}")
 
 
+# Profiling - Endpoints administrativos
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+def read_profiles():
+    """
+    Lista as requisições capturadas pelo profiler (lentas ou com cabeçalho X-Debug-Profile)
+    """
+    return list_profiles()
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def read_profile(profile_id: int):
+    """
+    Retorna uma captura completa: instruções SQL com tempos e relatório do cProfile
+    """
+    profile = get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@app.delete("/admin/profiles", dependencies=[Depends(require_admin)])
+def delete_profiles():
+    clear_profiles()
+    return {"message": "Capturas removidas"}
+
+
+# Backups do banco (snapshots SQLite) - Endpoints administrativos
+@app.get("/admin/backups", dependencies=[Depends(require_admin)])
+def read_backups():
+    """
+    Lista os snapshots do banco disponíveis
+    """
+    return list_snapshots()
+
+@app.post("/admin/backups", dependencies=[Depends(require_admin)])
+def create_backup():
+    """
+    Cria um snapshot do banco imediatamente
+    """
+    return create_snapshot()
+
+@app.post("/admin/backups/restore", dependencies=[Depends(require_admin)])
+def restore_backup(restore: RestoreRequest):
+    """
+    Restaura o banco para o snapshot mais recente feito até a data/hora informada
+    """
+    data_hora = restore.data_hora
+    if data_hora.tzinfo is not None:
+        # Os snapshots são nomeados no horário local do servidor
+        data_hora = data_hora.astimezone().replace(tzinfo=None)
+    try:
+        return restore_snapshot(data_hora)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 # Mount Frontend at Root (Must be last to avoid shadowing API routes)
-frontend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "frontend"))
-app.mount("/", StaticFiles(directory=frontend_path, html=True), name="frontend")
+# O diretório servido é gerado no startup (lifespan) com nomes com hash e arquivos pré-comprimidos
+app.mount("/", CachedStaticFiles(directory=static_build_path, html=True, check_dir=False), name="frontend")
@@ -0,0 +1,239 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from logic import calculate_cdb_monthly_return
+
+# Parâmetros padrão do modelo (usados quando não há histórico suficiente para calibrar)
+DEFAULT_REVERSAO_MENSAL = 0.05    # Fração da distância até a média corrigida por mês
+DEFAULT_VOLATILIDADE_MENSAL = 0.25  # Desvio padrão do choque mensal do CDI (pontos percentuais)
+MIN_PONTOS_CALIBRACAO = 6         # Meses mínimos de histórico para estimar o modelo
+PARALLEL_THRESHOLD = 2000         # A partir de quantos empréstimos usar o pool de processos
+# Limite de elementos (caminhos x meses, caminhos x empréstimos do lote) de cada matriz: ~80 MB em float64
+MAX_ELEMENTOS = int(os.environ.get("MONTE_CARLO_MAX_ELEMENTOS", "10000000"))
+# Processos do pool por worker do uvicorn: os núcleos divididos entre os workers (WEB_CONCURRENCY)
+MAX_WORKERS = int(os.environ.get(
+    "MONTE_CARLO_WORKERS",
+    str(max(1, (os.cpu_count() or 1) // int(os.environ.get("WEB_CONCURRENCY", "1"))))
+))
+PERCENTIS = (5, 50, 95)
+
+# Pool único por processo, criado no primeiro uso. Usa forkserver/spawn: fazer fork de um
+# worker do uvicorn que já tem threads (threadpool, agendador de backup) pode travar o filho.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def calibrate(serie_cdi):
+    """
+    Estima um modelo de reversão à média (Vasicek discreto, passo mensal) para o CDI
+
+    Ajusta cdi[t+1] = a + b * cdi[t] + e por mínimos quadrados:
+    reversão = 1 - b, média = a / (1 - b), volatilidade = desvio padrão de e
+
+    Args:
+        serie_cdi: Lista de (data ISO, CDI % a.a.) em qualquer ordem
+
+    Returns:
+        dict: {"cdi_inicial", "media", "reversao_mensal", "volatilidade_mensal", "calibrado"}
+              ou None se não houver nenhum valor de CDI
+    """
+    import numpy as np
+
+    # Reamostra para um valor por mês (o último registrado no mês)
+    por_mes = {}
+    for data, cdi in sorted(serie_cdi):
+        if cdi is not None:
+            por_mes[str(data)[:7]] = cdi
+    if not por_mes:
+        return None
+
+    valores = np.array([por_mes[mes] for mes in sorted(por_mes)], dtype=float)
+    modelo = {
+        "cdi_inicial": float(valores[-1]),
+        "media": float(valores.mean()),
+        "reversao_mensal": DEFAULT_REVERSAO_MENSAL,
+        "volatilidade_mensal": DEFAULT_VOLATILIDADE_MENSAL,
+        "calibrado": False
+    }
+
+    if len(valores) >= MIN_PONTOS_CALIBRACAO and valores[:-1].std() > 0:
+        b, a = np.polyfit(valores[:-1], valores[1:], 1)
+        if 0 < b < 1:
+            residuos = valores[1:] - (a + b * valores[:-1])
+            modelo.update({
+                "media": float(a / (1 - b)),
+                "reversao_mensal": float(1 - b),
+                "volatilidade_mensal": float(max(residuos.std(ddof=2) if len(residuos) > 2 else 0.0, 1e-6)),
+                "calibrado": True
+            })
+
+    return modelo
+
+
+def simulate_cdi_paths(modelo, n_caminhos: int, n_meses: int, seed: Optional[int]):
+    """
+    Gera caminhos de CDI anual (% a.a.), um por linha, com um passo por mês
+
+    Returns:
+        numpy.ndarray: matriz (n_caminhos, n_meses); a coluna 0 é o CDI inicial
+    """
+    import numpy as np
+
+    caminhos = np.empty((n_caminhos, n_meses))
+    for t, cdi in enumerate(_iterate_cdi(modelo, n_caminhos, n_meses, seed)):
+        caminhos[:, t] = cdi
+    return caminhos
+
+
+def _iterate_cdi(modelo, n_caminhos, n_meses, seed):
+    """
+    Gera o CDI de todos os caminhos mês a mês (um vetor por passo), sem materializar a matriz
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    k, media, volatilidade = modelo["reversao_mensal"], modelo["media"], modelo["volatilidade_mensal"]
+    cdi = np.full(n_caminhos, float(modelo["cdi_inicial"]))
+    for t in range(n_meses):
+        if t > 0:
+            cdi = np.maximum(cdi + k * (media - cdi) + rng.standard_normal(n_caminhos) * volatilidade, 0.0)
+        yield cdi
+
+
+def _evaluate_chunk(modelo, n_caminhos, n_meses, seed, valor_parcela, valor_parcela_adiantada, parcelas):
+    """
+    Avalia um bloco de empréstimos. Recebe só os parâmetros e regenera os caminhos a partir
+    da mesma seed, assim cada processo do pool não precisa receber a matriz inteira.
+
+    Economia de adiantar em cada caminho, somando as parcelas restantes mês a mês:
+        sum_t [(parcela - adiantada) - adiantada * rendimento_cdb_t]
+    Positiva quando adiantar vale mais do que investir o valor no CDB naquele mês.
+
+    Só o rendimento acumulado (n_caminhos, n_meses + 1) fica em memória: os caminhos são
+    gerados e acumulados coluna a coluna.
+    """
+    import numpy as np
+
+    acumulado = np.zeros((n_caminhos, n_meses + 1))
+    for t, cdi in enumerate(_iterate_cdi(modelo, n_caminhos, n_meses, seed)):
+        # calculate_cdb_monthly_return é só aritmética, então funciona direto sobre arrays
+        np.add(acumulado[:, t], calculate_cdb_monthly_return(cdi) / 100, out=acumulado[:, t + 1])
+
+    valor_parcela = np.asarray(valor_parcela, dtype=float)
+    valor_parcela_adiantada = np.asarray(valor_parcela_adiantada, dtype=float)
+    parcelas = np.asarray(parcelas, dtype=int)
+
+    # A matriz de economia do lote (n_caminhos, lote) respeita o mesmo limite de elementos
+    lote = max(1, MAX_ELEMENTOS // n_caminhos)
+    probabilidades = []
+    percentis = []
+    for inicio in range(0, len(parcelas), lote):
+        fatia = slice(inicio, inicio + lote)
+        p, a, n = valor_parcela[fatia], valor_parcela_adiantada[fatia], parcelas[fatia]
+        economia = n * (p - a) - a * acumulado[:, n]  # (n_caminhos, lote)
+        probabilidades.append((economia > 0).mean(axis=0))
+        percentis.append(np.percentile(economia, PERCENTIS, axis=0))
+
+    if not probabilidades:
+        return np.empty(0), np.empty((len(PERCENTIS), 0))
+    return np.concatenate(probabilidades), np.concatenate(percentis, axis=1)
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context(metodo))
+        return _pool
+
+
+def _discard_pool(executor):
+    global _pool
+    with _pool_lock:
+        if _pool is executor:
+            _pool = None
+
+
+def shutdown_pool():
+    """
+    Encerra o pool de processos (chamado no shutdown do app)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def run_monte_carlo(loans, modelo, n_caminhos: int, seed: Optional[int] = None):
+    """
+    Simula Adiantar vs Investir para cada empréstimo sob caminhos aleatórios de CDI
+
+    Args:
+        loans: Lista de (id, descricao, valor_parcela, valor_parcela_adiantada, qtd_parcelas_devidas)
+        modelo: Parâmetros do modelo (ver calibrate)
+        n_caminhos: Número de caminhos simulados
+        seed: Semente para resultados reprodutíveis
+
+    Returns:
+        list: Por empréstimo, probabilidade de adiantar ser vantajoso e percentis da economia
+
+    Raises:
+        ValueError: Se n_caminhos x meses ultrapassar MAX_ELEMENTOS
+    """
+    import numpy as np
+
+    loans = [loan for loan in loans if loan[4] and loan[4] > 0]
+    if not loans:
+        return []
+
+    if seed is None:
+        # Todos os blocos precisam da mesma seed para compartilhar os caminhos
+        seed = int(np.random.default_rng().integers(2**31))
+
+    ids, descricoes, valor_parcela, valor_parcela_adiantada, parcelas = zip(*loans)
+    n_meses = max(parcelas)
+    if n_caminhos * n_meses > MAX_ELEMENTOS:
+        raise ValueError(
+            f"n_caminhos x meses restantes ({n_caminhos} x {n_meses}) excede o limite de {MAX_ELEMENTOS}; "
+            f"use no máximo {MAX_ELEMENTOS // n_meses} caminhos"
+        )
+
+    if len(loans) >= PARALLEL_THRESHOLD and MAX_WORKERS > 1:
+        tamanho = -(-len(loans) // MAX_WORKERS)
+        blocos = [slice(i, i + tamanho) for i in range(0, len(loans), tamanho)]
+        executor = _get_pool()
+        futuros = [
+            executor.submit(
+                _evaluate_chunk, modelo, n_caminhos, n_meses, seed,
+                valor_parcela[b], valor_parcela_adiantada[b], parcelas[b]
+            )
+            for b in blocos
+        ]
+        try:
+            resultados = [f.result() for f in futuros]
+        except BrokenProcessPool:
+            # Um processo morreu (ex.: falta de memória): descarta o pool para recriá-lo no próximo uso
+            _discard_pool(executor)
+            raise
+        probabilidades = np.concatenate([r[0] for r in resultados])
+        percentis = np.concatenate([r[1] for r in resultados], axis=1)
+    else:
+        probabilidades, percentis = _evaluate_chunk(
+            modelo, n_caminhos, n_meses, seed, valor_parcela, valor_parcela_adiantada, parcelas
+        )
+
+    return [
+        {
+            "emprestimo_id": ids[i],
+            "descricao": descricoes[i],
+            "probabilidade_adiantar": float(probabilidades[i]),
+            **{f"economia_p{p}": float(percentis[j, i]) for j, p in enumerate(PERCENTIS)}
+        }
+        for i in range(len(loans))
+    ]
@@ -0,0 +1,359 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from itertools import count
+from typing import Optional
+
+from fastapi import Header, HTTPException
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+# Configuração (variáveis de ambiente)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")                       # Sem token, profiler e endpoints de admin ficam desativados
+PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", "1000"))  # Limite de latência para captura automática (0 desativa)
+PROFILE_BUFFER_SIZE = int(os.environ.get("PROFILE_BUFFER_SIZE", "50"))
+PROFILE_MAX_STATEMENTS = 500  # Limite de instruções SQL guardadas por requisição
+PROFILE_TOP_FUNCTIONS = 40    # Linhas do relatório cProfile / da amostragem de pilhas
+PROFILE_SAMPLE_MS = float(os.environ.get("PROFILE_SAMPLE_MS", "10"))  # Intervalo da amostragem de pilhas (0 desativa)
+PROFILE_MAX_STACK_DEPTH = 40  # Quadros guardados por amostra (a partir do mais interno)
+DEBUG_HEADER = "x-debug-profile"
+
+# Estado da requisição atual (visível também nas threads do threadpool do FastAPI)
+_current_capture: ContextVar[Optional["RequestCapture"]] = ContextVar("profiler_capture", default=None)
+
+# Ring buffer com as últimas capturas
+_profiles = deque(maxlen=PROFILE_BUFFER_SIZE)
+_profiles_lock = threading.Lock()
+_profile_ids = count(1)
+
+# cProfile só permite um profiler ativo por vez
+_cprofile_lock = threading.Lock()
+
+
+class RequestCapture:
+    """
+    Dados coletados durante uma requisição: instruções SQL (até PROFILE_MAX_STATEMENTS),
+    amostras de pilha do endpoint e, se solicitado pelo cabeçalho, perfil cProfile.
+    Só é guardada se pediu perfil ou se passou de PROFILE_SLOW_MS; senão é descartada.
+    """
+
+    __slots__ = ("want_profile", "statements", "statement_count", "sql_ms", "sql_start",
+                 "samples", "profile_text", "finished")
+
+    def __init__(self, want_profile: bool):
+        self.want_profile = want_profile
+        self.statements = []
+        self.statement_count = 0
+        self.sql_ms = 0.0
+        self.sql_start = 0.0
+        self.samples = Counter()
+        self.profile_text = None
+        self.finished = False  # Resposta já enviada: tarefas em segundo plano não entram na captura
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    capture = _current_capture.get()
+    if capture is not None and not capture.finished:
+        capture.sql_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    capture = _current_capture.get()
+    if capture is None or capture.finished:
+        return
+    elapsed_ms = (time.perf_counter() - capture.sql_start) * 1000
+    capture.statement_count += 1
+    capture.sql_ms += elapsed_ms
+    if len(capture.statements) < PROFILE_MAX_STATEMENTS:
+        capture.statements.append({"sql": statement, "ms": round(elapsed_ms, 3)})
+
+
+def profiling_enabled() -> bool:
+    """
+    O profiler só é instalado com ADMIN_TOKEN definido: sem ele, ninguém consegue ler as capturas
+    """
+    return bool(ADMIN_TOKEN)
+
+
+def install_sql_listeners(engine):
+    """
+    Registra os listeners que medem cada instrução SQL executada pelo engine
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class _StackSampler:
+    """
+    Amostrador de pilhas para requisições sem cabeçalho: uma thread que, a cada PROFILE_SAMPLE_MS,
+    registra a pilha das threads executando endpoints. Bem mais barato que o cProfile, então roda
+    em todas as requisições; o resultado só é guardado se a requisição acabar lenta.
+    A thread só é criada no primeiro uso e fica parada enquanto não há endpoints em execução.
+    """
+
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self._active = {}  # id da thread -> RequestCapture
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def register(self, capture):
+        ident = threading.get_ident()
+        with self._lock:
+            self._active[ident] = capture
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return ident
+
+    def unregister(self, ident):
+        with self._lock:
+            self._active.pop(ident, None)
+
+    def _run(self):
+        while True:
+            self._wake.clear()
+            with self._lock:
+                if self._active:
+                    frames = sys._current_frames()
+                    for ident, capture in self._active.items():
+                        frame = frames.get(ident)
+                        if frame is not None:
+                            capture.samples[_stack_key(frame)] += 1
+                    ocioso = False
+                else:
+                    ocioso = True
+            if ocioso:
+                self._wake.wait()
+            else:
+                time.sleep(self.interval)
+
+
+def _stack_key(frame) -> str:
+    quadros = []
+    while frame is not None and len(quadros) < PROFILE_MAX_STACK_DEPTH:
+        code = frame.f_code
+        quadros.append(f"{os.path.basename(code.co_filename)}:{frame.f_lineno}({code.co_name})")
+        frame = frame.f_back
+    return ";".join(reversed(quadros))
+
+
+_sampler = _StackSampler(PROFILE_SAMPLE_MS) if PROFILE_SAMPLE_MS > 0 else None
+
+
+def _run_sampled(capture, func, *args, **kwargs):
+    if _sampler is None:
+        return func(*args, **kwargs)
+    ident = _sampler.register(capture)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _sampler.unregister(ident)
+
+
+async def _run_sampled_async(capture, func, *args, **kwargs):
+    # Amostra a thread do event loop: endpoints async deste app fazem o trabalho pesado de forma síncrona
+    if _sampler is None:
+        return await func(*args, **kwargs)
+    ident = _sampler.register(capture)
+    try:
+        return await func(*args, **kwargs)
+    finally:
+        _sampler.unregister(ident)
+
+
+def _format_samples(samples) -> Optional[str]:
+    if not samples:
+        return None
+    total = sum(samples.values())
+    linhas = [f"Amostragem de pilhas: {total} amostras a cada {PROFILE_SAMPLE_MS:g} ms (pilha: externa;...;interna)"]
+    linhas += [f"{quantidade:6d}  {pilha}" for pilha, quantidade in samples.most_common(PROFILE_TOP_FUNCTIONS)]
+    return "\n".join(linhas)
+
+
+def _run_profiled(capture, func, *args, **kwargs):
+    if not _cprofile_lock.acquire(blocking=False):
+        # Outra requisição já está sendo perfilada; segue só com a captura de SQL
+        return func(*args, **kwargs)
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+    finally:
+        _cprofile_lock.release()
+        capture.profile_text = _format_profile(profile)
+
+
+async def _run_profiled_async(capture, func, *args, **kwargs):
+    if not _cprofile_lock.acquire(blocking=False):
+        return await func(*args, **kwargs)
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            profile.disable()
+    finally:
+        _cprofile_lock.release()
+        capture.profile_text = _format_profile(profile)
+
+
+def _format_profile(profile) -> str:
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return stream.getvalue()
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Rota que ativa o cProfile (requisição com cabeçalho) ou a amostragem de pilhas (demais requisições)
+    na thread que executa o endpoint. Endpoints síncronos rodam no threadpool, então o profiler
+    precisa ser ligado lá e não no middleware.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        if asyncio.iscoroutinefunction(endpoint):
+            @wraps(endpoint)
+            async def wrapped(*args, **kw):
+                capture = _current_capture.get()
+                if capture is None:
+                    return await endpoint(*args, **kw)
+                if not capture.want_profile:
+                    return await _run_sampled_async(capture, endpoint, *args, **kw)
+                return await _run_profiled_async(capture, endpoint, *args, **kw)
+        else:
+            @wraps(endpoint)
+            def wrapped(*args, **kw):
+                capture = _current_capture.get()
+                if capture is None:
+                    return endpoint(*args, **kw)
+                if not capture.want_profile:
+                    return _run_sampled(capture, endpoint, *args, **kw)
+                return _run_profiled(capture, endpoint, *args, **kw)
+
+        super().__init__(path, wrapped, **kwargs)
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que mede a latência de cada requisição e guarda no ring buffer
+    as que pediram perfil (cabeçalho X-Debug-Profile) ou passaram de PROFILE_SLOW_MS
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        want_profile = _wants_profile(scope)
+        if not want_profile and PROFILE_SLOW_MS <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        capture = RequestCapture(want_profile)
+        token = _current_capture.set(capture)
+        status = {"code": None}
+        fim = {"t": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Latência até o fim da resposta: BackgroundTasks (ex.: sincronização do Excel)
+                # rodam depois, ainda dentro de self.app, e não devem contar como lentidão
+                fim["t"] = time.perf_counter()
+                capture.finished = True
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed_ms = ((fim["t"] or time.perf_counter()) - start) * 1000
+            _current_capture.reset(token)
+            if capture.want_profile or (PROFILE_SLOW_MS > 0 and elapsed_ms >= PROFILE_SLOW_MS):
+                _store(scope, status["code"], elapsed_ms, capture)
+
+
+def _wants_profile(scope) -> bool:
+    if not ADMIN_TOKEN:
+        return False
+    for name, value in scope.get("headers", []):
+        if name == DEBUG_HEADER.encode():
+            return value.decode("latin-1") == ADMIN_TOKEN
+    return False
+
+
+def _store(scope, status_code, elapsed_ms, capture):
+    entry = {
+        "id": next(_profile_ids),
+        "timestamp": datetime.now().isoformat(),
+        "method": scope.get("method"),
+        "path": scope.get("path"),
+        "query": scope.get("query_string", b"").decode("latin-1"),
+        "status_code": status_code,
+        "duration_ms": round(elapsed_ms, 3),
+        "trigger": "header" if capture.want_profile else "slow",
+        "sql_count": capture.statement_count,
+        "sql_ms": round(capture.sql_ms, 3),
+        "sql": capture.statements,
+        "profile": capture.profile_text or _format_samples(capture.samples),
+    }
+    with _profiles_lock:
+        _profiles.append(entry)
+
+
+def list_profiles():
+    """
+    Retorna um resumo das capturas no ring buffer (mais recentes primeiro)
+    """
+    with _profiles_lock:
+        entries = list(_profiles)
+    return [
+        {key: entry[key] for key in (
+            "id", "timestamp", "method", "path", "status_code",
+            "duration_ms", "trigger", "sql_count", "sql_ms"
+        )}
+        for entry in reversed(entries)
+    ]
+
+
+def get_profile(profile_id: int):
+    with _profiles_lock:
+        for entry in _profiles:
+            if entry["id"] == profile_id:
+                return entry
+    return None
+
+
+def clear_profiles():
+    with _profiles_lock:
+        _profiles.clear()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependência que protege os endpoints administrativos com o token ADMIN_TOKEN
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Token de administrador inválido")
@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from contextlib import suppress
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from compression import accepted_encodings, brotli
+from file_utils import atomic_write_path, file_lock
+
+logger = logging.getLogger(__name__)
+
+HASHED_EXTENSIONS = (".js", ".css")                  # Recebem hash no nome e cache imutável
+PRECOMPRESSED_EXTENSIONS = (".js", ".css", ".html", ".svg")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"                        # HTML sempre revalida (ETag) para pegar novos hashes
+BUILD_LOCK_NAME = ".static_build.lock"              # Dentro do diretório de saída (ignorado na limpeza)
+HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.[a-z0-9]+$")
+ASSET_REFERENCE = re.compile(r'(src|href)="([^"?#]+)(\?[^"]*)?"')
+
+
+def _write(path, content: bytes):
+    with atomic_write_path(path) as temp_path:
+        with open(temp_path, "wb") as f:
+            f.write(content)
+
+
+def _write_precompressed(path, content: bytes, gerados: set):
+    # mtime=0 deixa o .gz idêntico entre builds (e entre workers)
+    _write(path + ".gz", gzip.compress(content, compresslevel=9, mtime=0))
+    gerados.add(os.path.basename(path) + ".gz")
+    if brotli is not None:
+        _write(path + ".br", brotli.compress(content, quality=11))
+        gerados.add(os.path.basename(path) + ".br")
+
+
+def build_static_assets(source_dir, build_dir):
+    """
+    Gera a versão servida do frontend: JS/CSS com hash do conteúdo no nome, HTML apontando
+    para os nomes com hash e variantes .gz/.br pré-comprimidas. Com vários workers, cada um
+    executa o build no startup: um lock no diretório de saída faz os builds rodarem um por vez,
+    e como o resultado é determinístico os seguintes apenas regravam os mesmos arquivos.
+
+    Args:
+        source_dir: Diretório do frontend (fonte)
+        build_dir: Diretório de saída servido pelo app
+
+    Returns:
+        dict: Mapa nome original -> nome com hash
+    """
+    os.makedirs(build_dir, exist_ok=True)
+    with file_lock(os.path.join(build_dir, BUILD_LOCK_NAME)):
+        manifesto = _build(source_dir, build_dir)
+    logger.info(f"📦 Frontend preparado em {build_dir}: {manifesto}")
+    return manifesto
+
+
+def _build(source_dir, build_dir):
+    arquivos = sorted(
+        nome for nome in os.listdir(source_dir)
+        if os.path.isfile(os.path.join(source_dir, nome))
+    )
+
+    manifesto = {}
+    gerados = set()
+    for nome in arquivos:
+        base, extensao = os.path.splitext(nome)
+        if extensao not in HASHED_EXTENSIONS:
+            continue
+        with open(os.path.join(source_dir, nome), "rb") as f:
+            conteudo = f.read()
+        nome_hash = f"{base}.{hashlib.sha256(conteudo).hexdigest()[:12]}{extensao}"
+        manifesto[nome] = nome_hash
+        # O nome original continua disponível (com revalidação) para páginas antigas em cache
+        for nome_servido in (nome_hash, nome):
+            destino = os.path.join(build_dir, nome_servido)
+            _write(destino, conteudo)
+            gerados.add(nome_servido)
+            _write_precompressed(destino, conteudo, gerados)
+
+    def _referencia(match):
+        atributo, caminho, _ = match.groups()
+        if caminho in manifesto:
+            return f'{atributo}="{manifesto[caminho]}"'
+        return match.group(0)
+
+    for nome in arquivos:
+        extensao = os.path.splitext(nome)[1]
+        if extensao in HASHED_EXTENSIONS:
+            continue
+        with open(os.path.join(source_dir, nome), "rb") as f:
+            conteudo = f.read()
+        if extensao == ".html":
+            conteudo = ASSET_REFERENCE.sub(_referencia, conteudo.decode("utf-8")).encode("utf-8")
+        destino = os.path.join(build_dir, nome)
+        _write(destino, conteudo)
+        gerados.add(nome)
+        if extensao in PRECOMPRESSED_EXTENSIONS:
+            _write_precompressed(destino, conteudo, gerados)
+
+    # Remove versões antigas (hashes de builds anteriores); tolera arquivos já removidos
+    # por outro processo que use o mesmo diretório sem o lock (ex.: versão anterior do app)
+    for nome in os.listdir(build_dir):
+        caminho = os.path.join(build_dir, nome)
+        if nome not in gerados and os.path.isfile(caminho) and not nome.startswith("."):
+            with suppress(FileNotFoundError):
+                os.remove(caminho)
+
+    return manifesto
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles com cache HTTP: arquivos com hash no nome são imutáveis por um ano, o resto
+    revalida a cada acesso. Serve a variante .br/.gz pré-comprimida quando o cliente aceita.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        nome = os.path.basename(full_path)
+        media_type = mimetypes.guess_type(nome)[0] or "text/plain"
+        cache_control = IMMUTABLE_CACHE if HASHED_NAME.search(nome) else REVALIDATE_CACHE
+
+        headers = {"Cache-Control": cache_control}
+        caminho, stat_servido = full_path, stat_result
+        if os.path.splitext(nome)[1] in PRECOMPRESSED_EXTENSIONS:
+            headers["Vary"] = "Accept-Encoding"
+            aceitas = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for encoding, sufixo in (("br", ".br"), ("gzip", ".gz")):
+                if encoding in aceitas and os.path.isfile(full_path + sufixo):
+                    caminho = full_path + sufixo
+                    stat_servido = os.stat(caminho)
+                    headers["Content-Encoding"] = encoding
+                    break
+
+        response = FileResponse(
+            caminho,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=stat_servido,
+            method=scope["method"],
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,63 @@
+"""
+Servidor local que imita a API SGS do BACEN, para benchmarks sem acesso à rede
+
+Uso:
+    python benchmarks/bacen_stub.py --port 8099
+    BACEN_BASE_URL=http://127.0.0.1:8099/dados/serie/bcdata.sgs uvicorn main:app
+"""
+import argparse
+import json
+import re
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BASE_PATH = "/dados/serie/bcdata.sgs"
+VALORES = {432: "10,50", 4389: "10,40"}  # SELIC meta e CDI anualizado
+SERIE_PATH = re.compile(r"^" + re.escape(BASE_PATH) + r"\.(\d+)/dados$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        match = SERIE_PATH.match(self.path.split("?", 1)[0])
+        if not match:
+            self.send_error(404)
+            return
+
+        valor = VALORES.get(int(match.group(1)), "10,00")
+        hoje = date.today()
+        dados = [
+            {"data": (hoje - timedelta(days=dias)).strftime("%d/%m/%Y"), "valor": valor}
+            for dias in range(5, -1, -1)
+        ]
+        corpo = json.dumps(dados).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format, *args):
+        pass  # Silencioso durante os benchmarks
+
+
+def start_stub(host="127.0.0.1", port=0):
+    """
+    Inicia o stub em uma thread
+
+    Returns:
+        tuple: (servidor, BACEN_BASE_URL para o app)
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="bacen-stub", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{BASE_PATH}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub local da API SGS do BACEN")
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), _Handler)
+    print(f"BACEN stub em http://127.0.0.1:{args.port}{BASE_PATH}")
+    server.serve_forever()
@@ -0,0 +1,240 @@
+"""
+Driver de carga HTTP: sobe o app com uvicorn sobre um banco sintético e o stub do BACEN
+e mede latência/throughput de cada rota de backend/main.py
+
+Uso:
+    python benchmarks/load.py --db bench_loans.db --requests 200 --concurrency 8
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend")
+sys.path.append(BACKEND_DIR)
+
+from bacen_stub import start_stub
+from stats import summarize
+
+ADMIN_TOKEN = "benchmark"
+ADMIN_HEADERS = {"X-Admin-Token": ADMIN_TOKEN}
+
+
+def _loan_payload(rng):
+    valor = round(rng.uniform(100, 5000), 2)
+    return {
+        "descricao": f"Carga {rng.randrange(10**9)}",
+        "instituicao_credora": "Banco Benchmark",
+        "valor_parcela": valor,
+        "qtd_total_parcelas": 48,
+        "qtd_parcelas_devidas": 30,
+        "valor_parcela_adiantada": round(valor * 0.99, 2),
+        "taxa_selic_registro": 10.5,
+        "taxa_cdi_registro": 10.4,
+        "data_cadastro": "2024-01-10",
+        "dia_vencimento": 10
+    }
+
+
+def build_scenarios(n_loans, excel_file):
+    """
+    Um cenário por rota do app. Cada cenário recebe (rng) e devolve os argumentos de requests.request.
+    `max_requests` limita rotas caras (export/import Excel, histórico completo, backups).
+    """
+    loan = lambda rng: rng.randint(1, max(n_loans, 1))
+    return [
+        {"route": ("GET", "/loans"), "max_requests": 20, "request": lambda rng: ("GET", "/loans", {})},
+        {"route": ("POST", "/loans"), "request": lambda rng: ("POST", "/loans", {"json": _loan_payload(rng)})},
+        {"route": ("GET", "/dashboard-stats"), "request": lambda rng: ("GET", "/dashboard-stats", {})},
+        {"route": ("POST", "/simulate"), "request": lambda rng: ("POST", "/simulate", {"json": _loan_payload(rng)})},
+        {"route": ("PATCH", "/loans/{loan_id}"), "request": lambda rng: ("PATCH", f"/loans/{loan(rng)}", {"json": {
+            "valor_parcela_adiantada": round(rng.uniform(90, 4900), 2),
+            "taxa_selic_registro": 10.5, "taxa_cdi_registro": 10.4,
+            "update_date": "2024-06-15"
+        }})},
+        {"route": ("GET", "/taxas/atuais"), "request": lambda rng: ("GET", "/taxas/atuais", {})},
+        {"route": ("POST", "/loans/{loan_id}/historico"), "request": lambda rng: ("POST", f"/loans/{loan(rng)}/historico", {"json": {
+            "data_registro": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "valor_parcela_adiantada": round(rng.uniform(90, 4900), 2),
+            "taxa_selic": 10.5, "taxa_cdi": 10.4
+        }})},
+        {"route": ("GET", "/loans/{loan_id}/historico"), "request": lambda rng: ("GET", f"/loans/{loan(rng)}/historico", {})},
+        {"route": ("GET", "/historico/all"), "max_requests": 10,
+         "request": lambda rng: ("GET", "/historico/all", {"params": {"pontos": 300, "bucket": "week"}})},
+        {"route": ("GET", "/historico/analise"), "request": lambda rng: ("GET", "/historico/analise", {"params": {"emprestimo_id": loan(rng)}})},
+        {"route": ("POST", "/otimizador/adiantamento"), "max_requests": 50,
+         "request": lambda rng: ("POST", "/otimizador/adiantamento", {"json": {"orcamento": 50000, "taxa_cdi": 10.4}})},
+        {"route": ("GET", "/simulacao/cdi"), "request": lambda rng: ("GET", "/simulacao/cdi", {"params": {
+            "cdi_atual": 10.4, "cdi_novo": round(rng.uniform(8, 13), 2)
+        }})},
+        {"route": ("POST", "/simulacao/monte-carlo"), "max_requests": 5,
+         "request": lambda rng: ("POST", "/simulacao/monte-carlo", {"json": {"n_caminhos": 1000, "seed": 1}})},
+        {"route": ("GET", "/export/excel"), "max_requests": 3, "request": lambda rng: ("GET", "/export/excel", {})},
+        {"route": ("POST", "/import/excel"), "max_requests": 3, "request": lambda rng: ("POST", "/import/excel", {
+            "files": {"file": ("carga.xlsx", io.BytesIO(excel_file()), "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+        })},
+        {"route": ("GET", "/admin/profiles"), "request": lambda rng: ("GET", "/admin/profiles", {"headers": ADMIN_HEADERS})},
+        {"route": ("GET", "/admin/profiles/{profile_id}"), "request": lambda rng: ("GET", "/admin/profiles/1", {"headers": ADMIN_HEADERS}),
+         "ok_status": (200, 404)},
+        {"route": ("DELETE", "/admin/profiles"), "max_requests": 5, "request": lambda rng: ("DELETE", "/admin/profiles", {"headers": ADMIN_HEADERS})},
+        {"route": ("GET", "/admin/backups"), "request": lambda rng: ("GET", "/admin/backups", {"headers": ADMIN_HEADERS})},
+        {"route": ("POST", "/admin/backups"), "max_requests": 3, "request": lambda rng: ("POST", "/admin/backups", {"headers": ADMIN_HEADERS})},
+        {"route": ("POST", "/admin/backups/restore"), "max_requests": 1, "request": lambda rng: ("POST", "/admin/backups/restore", {
+            "headers": ADMIN_HEADERS, "json": {"data_hora": datetime.now().isoformat()}
+        })},
+        {"route": ("GET", "/"), "request": lambda rng: ("GET", "/", {"headers": {"Accept-Encoding": "gzip, br"}})},
+    ]
+
+
+def check_coverage(scenarios):
+    """
+    Compara os cenários com as rotas registradas no app e retorna as rotas sem cenário
+    """
+    from fastapi.routing import APIRoute
+    import main
+
+    rotas = {
+        (metodo, rota.path)
+        for rota in main.app.routes if isinstance(rota, APIRoute)
+        for metodo in rota.methods
+    }
+    cobertas = {cenario["route"] for cenario in scenarios}
+    return sorted(rotas - cobertas)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path, workdir, bacen_url, workers=1):
+    """
+    Sobe o uvicorn em um diretório de trabalho isolado, com uma cópia do banco sintético
+
+    Returns:
+        tuple: (processo, URL base)
+    """
+    shutil.copy(db_path, os.path.join(workdir, "loans.db"))
+    porta = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": "sqlite:///./loans.db",
+        "BACEN_BASE_URL": bacen_url,
+        "ADMIN_TOKEN": ADMIN_TOKEN,
+        "EXCEL_AUTO_SYNC": os.environ.get("EXCEL_AUTO_SYNC", "0"),
+        "BACKUP_INTERVAL_MINUTES": "0",
+        "STATIC_BUILD_DIR": os.path.join(workdir, "frontend_build"),
+        "PYTHONPATH": os.path.abspath(BACKEND_DIR),
+    }
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(porta), "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env
+    )
+    base_url = f"http://127.0.0.1:{porta}"
+    prazo = time.time() + 120
+    while time.time() < prazo:
+        if processo.poll() is not None:
+            raise RuntimeError("uvicorn encerrou durante o startup")
+        try:
+            if requests.get(base_url + "/dashboard-stats", timeout=1).status_code == 200:
+                return processo, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError("uvicorn não respondeu a tempo")
+
+
+def run_scenario(base_url, scenario, n_requests, concurrency, seed):
+    rng_lock = threading.Lock()
+    rng = random.Random(seed)
+    local = threading.local()
+    ok_status = scenario.get("ok_status", (200,))
+
+    def executar(_):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        with rng_lock:
+            metodo, caminho, kwargs = scenario["request"](rng)
+        inicio = time.perf_counter()
+        resposta = local.session.request(metodo, base_url + caminho, timeout=300, **kwargs)
+        _ = resposta.content
+        return time.perf_counter() - inicio, resposta.status_code in ok_status
+
+    n_requests = min(n_requests, scenario.get("max_requests", n_requests))
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(concurrency, n_requests)) as executor:
+        resultados = list(executor.map(executar, range(n_requests)))
+    duracao = time.perf_counter() - inicio
+
+    latencias = [latencia for latencia, _ in resultados]
+    erros = sum(1 for _, ok in resultados if not ok)
+    return {**summarize(latencias, duracao, erros), "concurrency": min(concurrency, n_requests)}
+
+
+def run_load(db_path, n_requests=100, concurrency=8, seed=42, workers=1, verbose=True):
+    """
+    Executa todos os cenários contra um servidor recém-iniciado
+
+    Returns:
+        dict: Resultado por rota ("METHOD path") e rotas sem cenário
+    """
+    conn = sqlite3.connect(db_path)
+    n_loans = conn.execute("SELECT COALESCE(MAX(id), 0) FROM emprestimos").fetchone()[0]
+    conn.close()
+
+    stub, bacen_url = start_stub()
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    processo, base_url = start_server(db_path, workdir, bacen_url, workers)
+
+    excel_cache = {}
+
+    def excel_file():
+        # Arquivo de importação: o export do próprio servidor, baixado uma vez
+        if "conteudo" not in excel_cache:
+            excel_cache["conteudo"] = requests.get(base_url + "/export/excel", timeout=600).content
+        return excel_cache["conteudo"]
+
+    try:
+        scenarios = build_scenarios(n_loans, excel_file)
+        resultados = {}
+        for indice, scenario in enumerate(scenarios):
+            nome = " ".join(scenario["route"])
+            resultados[nome] = run_scenario(base_url, scenario, n_requests, concurrency, seed + indice)
+            if verbose:
+                r = resultados[nome]
+                print(f"  {nome:40s} p50={r['p50_ms']} ms p95={r['p95_ms']} ms p99={r['p99_ms']} ms "
+                      f"{r['throughput_per_s']} req/s erros={r['errors']}", flush=True)
+        return {"routes": resultados, "uncovered_routes": [" ".join(r) for r in check_coverage(scenarios)]}
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+        stub.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Teste de carga HTTP das rotas do app")
+    parser.add_argument("--db", required=True, help="Banco sintético (ver synthetic_data.py)")
+    parser.add_argument("--requests", type=int, default=100, help="Requisições por rota")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1, help="Workers do uvicorn")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    resultado = run_load(args.db, args.requests, args.concurrency, args.seed, args.workers)
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
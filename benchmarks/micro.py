@@ -0,0 +1,165 @@
+"""
+Microbenchmarks de logic.py, da exportação/importação Excel e dos módulos de análise
+
+Uso:
+    python benchmarks/micro.py --db bench_loans.db
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Emprestimo, HistoricoValorAdiantado
+from logic import (
+    calculate_monthly_discount_rate, calculate_cdb_monthly_return, get_recommendation,
+    calculate_remaining_installments, calculate_break_even_cdi, optimize_prepayment
+)
+from stats import summarize
+
+
+def _measure(func, repeticoes):
+    latencias = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        latencias.append(time.perf_counter() - inicio)
+    return summarize(latencias)
+
+
+def _measure_batch(func, argumentos, repeticoes):
+    """
+    Funções baratas demais para medir uma a uma: mede lotes e reporta por chamada
+    """
+    latencias = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for args in argumentos:
+            func(*args)
+        latencias.append((time.perf_counter() - inicio) / len(argumentos))
+    return {**summarize(latencias), "calls_per_sample": len(argumentos)}
+
+
+def run_logic_benchmarks(seed=42, n_loans=100000, repeticoes=20):
+    rng = random.Random(seed)
+    pares = [(p := rng.uniform(100, 5000), p * rng.uniform(0.97, 0.998)) for _ in range(10000)]
+    cdis = [(rng.uniform(2, 15),) for _ in range(10000)]
+    descontos = [(rng.uniform(0.1, 3),) for _ in range(10000)]
+    datas = [
+        (datetime(2020, rng.randint(1, 12), 1), rng.choice([12, 60, 360]), rng.randint(1, 28), datetime(2024, 6, 15))
+        for _ in range(10000)
+    ]
+    carteira = [
+        (i, f"L{i}", p := rng.uniform(100, 5000), p * rng.uniform(0.97, 0.998), rng.randint(1, 360))
+        for i in range(n_loans)
+    ]
+
+    return {
+        "calculate_monthly_discount_rate": _measure_batch(calculate_monthly_discount_rate, pares, repeticoes),
+        "calculate_cdb_monthly_return": _measure_batch(calculate_cdb_monthly_return, cdis, repeticoes),
+        "get_recommendation": _measure_batch(get_recommendation, pares, repeticoes),
+        "calculate_break_even_cdi": _measure_batch(calculate_break_even_cdi, descontos, repeticoes),
+        "calculate_remaining_installments": _measure_batch(calculate_remaining_installments, datas, repeticoes),
+        f"optimize_prepayment[{n_loans}]": _measure(
+            lambda: optimize_prepayment(carteira, 1_000_000, 10.65), max(3, repeticoes // 4)
+        ),
+    }
+
+
+def run_analysis_benchmarks(seed=42, repeticoes=5):
+    from downsampling import aggregate_buckets, lttb
+    from monte_carlo import calibrate, run_monte_carlo
+
+    rng = random.Random(seed)
+    serie = [
+        {"data_registro": f"{2000 + i // 365:04d}-{(i // 30) % 12 + 1:02d}-{i % 28 + 1:02d}",
+         "valor_parcela_adiantada": rng.uniform(90, 100), "taxa_selic": 10.0, "taxa_cdi": 10.0}
+        for i in range(100000)
+    ]
+    serie.sort(key=lambda p: p["data_registro"])
+    modelo = calibrate([(f"20{a:02d}-{m:02d}-01", rng.uniform(8, 14)) for a in range(10, 25) for m in range(1, 13)])
+    carteira = [
+        (i, f"L{i}", p := rng.uniform(100, 5000), p * rng.uniform(0.97, 0.998), rng.randint(1, 360))
+        for i in range(1000)
+    ]
+
+    return {
+        "lttb[100k->500]": _measure(lambda: lttb(serie, 500), repeticoes),
+        "aggregate_buckets[100k,month]": _measure(lambda: list(aggregate_buckets(serie, "month")), repeticoes),
+        "monte_carlo[10k paths x 1k loans]": _measure(
+            lambda: run_monte_carlo(carteira, modelo, 10000, seed=seed), max(1, repeticoes // 2)
+        ),
+    }
+
+
+def run_excel_benchmarks(db_path, max_loans=2000, repeticoes=3):
+    """
+    Exporta até `max_loans` empréstimos (com seus históricos) do banco sintético e reimporta
+    o arquivo em um banco vazio, medindo as duas etapas
+    """
+    from excel_handler import export_loans_to_excel, import_loans_from_excel
+    from database import Base
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    Session = sessionmaker(bind=engine)
+    db = Session()
+    try:
+        emprestimos = db.query(Emprestimo).order_by(Emprestimo.id).limit(max_loans).all()
+        ids = [e.id for e in emprestimos]
+        historicos = db.query(HistoricoValorAdiantado).filter(
+            HistoricoValorAdiantado.emprestimo_id <= (ids[-1] if ids else 0)
+        ).all()
+    finally:
+        db.close()
+        engine.dispose()
+
+    pasta = tempfile.mkdtemp(prefix="bench_excel_")
+    arquivo = os.path.join(pasta, "export.xlsx")
+    try:
+        export = _measure(lambda: export_loans_to_excel(emprestimos, historicos, file_path=arquivo), repeticoes)
+
+        latencias = []
+        for i in range(repeticoes):
+            destino = os.path.join(pasta, f"import_{i}.db")
+            engine_destino = create_engine(f"sqlite:///{destino}")
+            Base.metadata.create_all(bind=engine_destino)
+            sessao = sessionmaker(bind=engine_destino)()
+            inicio = time.perf_counter()
+            import_loans_from_excel(arquivo, sessao)
+            latencias.append(time.perf_counter() - inicio)
+            sessao.close()
+            engine_destino.dispose()
+
+        return {
+            f"export_loans_to_excel[{len(emprestimos)} loans, {len(historicos)} history]": export,
+            f"import_loans_from_excel[{len(emprestimos)} loans, {len(historicos)} history]": summarize(latencias),
+        }
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+def run_all(db_path, seed=42, excel_max_loans=2000):
+    return {
+        "logic": run_logic_benchmarks(seed),
+        "analysis": run_analysis_benchmarks(seed),
+        "excel": run_excel_benchmarks(db_path, excel_max_loans),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks do backend")
+    parser.add_argument("--db", required=True, help="Banco sintético (ver synthetic_data.py)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--excel-max-loans", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(json.dumps(run_all(args.db, args.seed, args.excel_max_loans), indent=2, ensure_ascii=False))
@@ -0,0 +1,93 @@
+"""
+Suite de benchmarks reprodutível: gera uma carteira sintética (seed), roda os microbenchmarks
+e o teste de carga HTTP e grava tudo em JSON para comparar execuções ao longo do tempo
+
+Uso:
+    python benchmarks/run.py --loans 10000 --history 50 --requests 200 --concurrency 8
+    python benchmarks/run.py --loans 100000 --history 100    # 10M registros de histórico
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from synthetic_data import generate_database
+import micro
+import load
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do sistema de empréstimos")
+    parser.add_argument("--loans", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=20, help="Registros de histórico por empréstimo")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=100, help="Requisições por rota no teste de carga")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=1, help="Workers do uvicorn no teste de carga")
+    parser.add_argument("--excel-max-loans", type=int, default=2000)
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: benchmarks/results/<data>.json)")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_")
+    db_path = os.path.join(pasta, "bench_loans.db")
+
+    print(f"Gerando carteira sintética ({args.loans} empréstimos x {args.history} históricos, seed {args.seed})...")
+    dados = generate_database(db_path, args.loans, args.history, args.seed)
+
+    resultado = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "dataset": dados,
+        }
+    }
+
+    if not args.skip_micro:
+        print("Microbenchmarks...")
+        inicio = time.perf_counter()
+        resultado["micro"] = micro.run_all(db_path, args.seed, args.excel_max_loans)
+        print(f"  concluído em {time.perf_counter() - inicio:.1f} s")
+
+    if not args.skip_load:
+        print("Teste de carga HTTP...")
+        resultado["load"] = load.run_load(db_path, args.requests, args.concurrency, args.seed, args.workers)
+
+    saida = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"✅ Resultados gravados em {saida}")
+
+    os.remove(db_path)
+    for sufixo in ("-wal", "-shm"):
+        if os.path.exists(db_path + sufixo):
+            os.remove(db_path + sufixo)
+    os.rmdir(pasta)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import math
+
+
+def percentile(valores_ordenados, p):
+    """
+    Percentil pelo método nearest-rank sobre uma lista já ordenada
+    """
+    if not valores_ordenados:
+        return None
+    k = max(0, math.ceil(p / 100 * len(valores_ordenados)) - 1)
+    return valores_ordenados[k]
+
+
+def summarize(latencias, duracao_total=None, erros=0):
+    """
+    Resume uma lista de latências (em segundos)
+
+    Args:
+        latencias: Latência de cada execução, em segundos
+        duracao_total: Tempo de parede da rodada (para throughput); padrão: soma das latências
+        erros: Quantidade de execuções com falha
+
+    Returns:
+        dict: n, erros, p50/p95/p99/média/máximo em ms e throughput em operações por segundo
+    """
+    ordenadas = sorted(latencias)
+    duracao = duracao_total if duracao_total is not None else sum(ordenadas)
+    ms = lambda valor: round(valor * 1000, 6) if valor is not None else None
+    return {
+        "n": len(ordenadas),
+        "errors": erros,
+        "p50_ms": ms(percentile(ordenadas, 50)),
+        "p95_ms": ms(percentile(ordenadas, 95)),
+        "p99_ms": ms(percentile(ordenadas, 99)),
+        "mean_ms": ms(sum(ordenadas) / len(ordenadas)) if ordenadas else None,
+        "max_ms": ms(ordenadas[-1]) if ordenadas else None,
+        "throughput_per_s": round(len(ordenadas) / duracao, 3) if duracao else None
+    }
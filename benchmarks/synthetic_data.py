@@ -0,0 +1,152 @@
+"""
+Gerador de carteiras sintéticas reprodutíveis (seed) para benchmarks
+
+Uso:
+    python benchmarks/synthetic_data.py --loans 100000 --history 100 --output bench.db
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from sqlalchemy import create_engine
+
+from database import Base, _analise_rows, _break_even_for
+
+INSTITUICOES = ["Banco A", "Banco B", "Financeira C", "Cooperativa D", "Banco E"]
+BATCH_SIZE = 50000
+DATA_INICIAL = date(2015, 1, 1)
+
+
+def _cdi_series(rng, dias):
+    """
+    Caminho diário de CDI (% a.a.) com reversão à média, compartilhado por todos os empréstimos
+    """
+    cdi = 10.0
+    serie = []
+    for _ in range(dias):
+        cdi = max(0.5, cdi + 0.002 * (10.5 - cdi) + rng.gauss(0, 0.03))
+        serie.append(round(cdi, 2))
+    return serie
+
+
+def generate_database(path, n_loans=1000, history_per_loan=20, seed=42, verbose=True):
+    """
+    Cria um banco SQLite com o schema do app e uma carteira sintética
+
+    Args:
+        path: Caminho do arquivo .db (sobrescrito se existir)
+        n_loans: Quantidade de empréstimos
+        history_per_loan: Registros de histórico por empréstimo (um por dia, a partir de uma data aleatória)
+        seed: Semente do gerador; a mesma seed gera sempre os mesmos dados
+
+    Returns:
+        dict: Contadores e tempo de geração
+    """
+    inicio = time.perf_counter()
+    rng = random.Random(seed)
+
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    dias = 3650 + history_per_loan
+    cdi_por_dia = _cdi_series(rng, dias)
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    loans = []
+    historicos = []
+    analises = []
+    historico_id = 0
+    total_historicos = 0
+
+    def flush():
+        conn.executemany(
+            "INSERT INTO emprestimos (id, descricao, instituicao_credora, valor_parcela, qtd_total_parcelas, "
+            "qtd_parcelas_devidas, valor_parcela_adiantada, taxa_selic_registro, taxa_cdi_registro, "
+            "data_cadastro, dia_vencimento, cdi_break_even) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            loans
+        )
+        conn.executemany(
+            "INSERT INTO historico_valores_adiantados (id, emprestimo_id, data_registro, "
+            "valor_parcela_adiantada, taxa_selic, taxa_cdi) VALUES (?, ?, ?, ?, ?, ?)",
+            historicos
+        )
+        conn.executemany(
+            "INSERT INTO analise_historico (historico_id, emprestimo_id, data_registro, "
+            "discount_monthly_percent, cdb_monthly_return, recommendation, virada) VALUES (:historico_id, "
+            ":emprestimo_id, :data_registro, :discount_monthly_percent, :cdb_monthly_return, :recommendation, :virada)",
+            analises
+        )
+        conn.commit()
+        loans.clear()
+        historicos.clear()
+        analises.clear()
+
+    for loan_id in range(1, n_loans + 1):
+        valor_parcela = round(rng.uniform(100, 5000), 2)
+        desconto = rng.uniform(0.002, 0.03)
+        valor_adiantada = round(valor_parcela * (1 - desconto), 2)
+        total_parcelas = rng.choice([12, 24, 36, 48, 60, 120, 240, 360])
+        devidas = rng.randint(1, total_parcelas)
+        inicio_dia = rng.randrange(0, dias - history_per_loan)
+        data_cadastro = DATA_INICIAL + timedelta(days=inicio_dia)
+        cdi = cdi_por_dia[inicio_dia]
+        loans.append((
+            loan_id, f"Empréstimo {loan_id}", rng.choice(INSTITUICOES), valor_parcela, total_parcelas,
+            devidas, valor_adiantada, round(cdi + 0.1, 2), cdi, data_cadastro.isoformat(),
+            rng.randint(1, 28), _break_even_for(valor_parcela, valor_adiantada)
+        ))
+
+        historicos_emprestimo = []
+        for dia in range(history_per_loan):
+            historico_id += 1
+            indice = inicio_dia + dia
+            cdi_dia = cdi_por_dia[indice]
+            valor = round(valor_adiantada * (1 + rng.gauss(0, 0.002)), 2)
+            data_registro = (DATA_INICIAL + timedelta(days=indice)).isoformat()
+            historicos.append((historico_id, loan_id, data_registro, valor, round(cdi_dia + 0.1, 2), cdi_dia))
+            historicos_emprestimo.append((historico_id, data_registro, valor, cdi_dia))
+
+        # Mesma derivação usada pelo app (database._analise_rows), para ele não reconstruir no startup
+        analises.extend(_analise_rows(loan_id, valor_parcela, cdi, historicos_emprestimo))
+        total_historicos += history_per_loan
+
+        if len(historicos) >= BATCH_SIZE or len(loans) >= BATCH_SIZE:
+            flush()
+            if verbose:
+                print(f"  {loan_id}/{n_loans} empréstimos, {total_historicos} históricos", flush=True)
+
+    flush()
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+    return {
+        "loans": n_loans,
+        "history_rows": total_historicos,
+        "seed": seed,
+        "seconds": round(time.perf_counter() - inicio, 3)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera uma carteira sintética para benchmarks")
+    parser.add_argument("--loans", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=20, help="Registros de histórico por empréstimo")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench_loans.db")
+    args = parser.parse_args()
+
+    resultado = generate_database(args.output, args.loans, args.history, args.seed)
+    print(f"✅ {resultado['loans']} empréstimos e {resultado['history_rows']} históricos em {resultado['seconds']} s -> {args.output}")
@@ -325,9 +325,11 @@ function renderTable(loans) {
 
 
 // Evolution Chart - Multi-line chart for historical values
+const EVOLUTION_MAX_POINTS = 300; // Downsampled on the server so the chart stays light
+
 async function fetchEvolutionData() {
     try {
-        const response = await fetch(`${API_URL}/historico/all`);
+        const response = await fetch(`${API_URL}/historico/all?pontos=${EVOLUTION_MAX_POINTS}`);
         const data = await response.json();
         renderEvolutionChart(data);
     } catch (error) {
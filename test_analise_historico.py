@@ -0,0 +1,127 @@
+"""
+Testes da análise incremental do histórico: flag de virada com inserções fora de ordem
+e recálculo quando os dados do empréstimo usados na análise mudam
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, Emprestimo, HistoricoValorAdiantado, AnaliseHistorico, _rebuild_analise
+
+# Com parcela 100 e adiantada 99 o desconto é ~1,01% a.m.: CDI 10% -> Adiantar, CDI 20% -> Investir
+CDI_ADIANTAR = 10.0
+CDI_INVESTIR = 20.0
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'loans.db'}")
+    Base.metadata.create_all(bind=engine)
+    sessao = sessionmaker(bind=engine)()
+    yield sessao
+    sessao.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def emprestimo(db):
+    loan = Emprestimo(
+        descricao="Teste", instituicao_credora="Banco", valor_parcela=100.0, valor_parcela_adiantada=99.0,
+        qtd_total_parcelas=12, qtd_parcelas_devidas=12, taxa_selic_registro=10.5,
+        taxa_cdi_registro=CDI_ADIANTAR, data_cadastro="2024-01-01", dia_vencimento=10
+    )
+    db.add(loan)
+    db.commit()
+    return loan
+
+
+def _registrar(db, emprestimo, data, taxa_cdi):
+    db.add(HistoricoValorAdiantado(
+        emprestimo_id=emprestimo.id, data_registro=data, valor_parcela_adiantada=99.0, taxa_cdi=taxa_cdi
+    ))
+    db.commit()
+
+
+def _analise(db):
+    return [
+        (linha.data_registro, linha.recommendation, linha.virada)
+        for linha in db.execute(
+            select(AnaliseHistorico).order_by(AnaliseHistorico.data_registro, AnaliseHistorico.historico_id)
+        ).scalars()
+    ]
+
+
+def _analise_recalculada(db, emprestimo):
+    with db.get_bind().begin() as conn:
+        _rebuild_analise(conn, emprestimo.id)
+    db.expire_all()
+    return _analise(db)
+
+
+def test_in_order_inserts_flag_flips(db, emprestimo):
+    _registrar(db, emprestimo, "2024-01-01", CDI_ADIANTAR)
+    _registrar(db, emprestimo, "2024-02-01", CDI_INVESTIR)
+    _registrar(db, emprestimo, "2024-03-01", CDI_INVESTIR)
+
+    assert _analise(db) == [
+        ("2024-01-01", "Adiantar", False),
+        ("2024-02-01", "Investir", True),
+        ("2024-03-01", "Investir", False),
+    ]
+
+
+def test_out_of_order_insert_fixes_successor_flag(db, emprestimo):
+    _registrar(db, emprestimo, "2024-01-01", CDI_ADIANTAR)
+    _registrar(db, emprestimo, "2024-03-01", CDI_ADIANTAR)
+    assert [virada for _, _, virada in _analise(db)] == [False, False]
+
+    # Ponto no meio com recomendação diferente: vira em relação ao anterior e o seguinte também vira
+    _registrar(db, emprestimo, "2024-02-01", CDI_INVESTIR)
+    incremental = _analise(db)
+    assert incremental == [
+        ("2024-01-01", "Adiantar", False),
+        ("2024-02-01", "Investir", True),
+        ("2024-03-01", "Adiantar", True),
+    ]
+    assert incremental == _analise_recalculada(db, emprestimo)
+
+
+def test_insert_before_first_point_matches_rebuild(db, emprestimo):
+    _registrar(db, emprestimo, "2024-02-01", CDI_INVESTIR)
+    _registrar(db, emprestimo, "2024-03-01", CDI_INVESTIR)
+    _registrar(db, emprestimo, "2024-01-01", CDI_INVESTIR)
+    _registrar(db, emprestimo, "2024-01-15", CDI_ADIANTAR)
+
+    incremental = _analise(db)
+    assert [virada for _, _, virada in incremental] == [False, True, True, False]
+    assert incremental == _analise_recalculada(db, emprestimo)
+
+
+def test_loan_cdi_change_refreshes_points_without_cdi(db, emprestimo):
+    _registrar(db, emprestimo, "2024-01-01", None)
+    _registrar(db, emprestimo, "2024-02-01", CDI_ADIANTAR)
+    assert [recomendacao for _, recomendacao, _ in _analise(db)] == ["Adiantar", "Adiantar"]
+
+    emprestimo.taxa_cdi_registro = CDI_INVESTIR
+    db.commit()
+
+    assert _analise(db) == [
+        ("2024-01-01", "Investir", False),
+        ("2024-02-01", "Adiantar", True),
+    ]
+
+
+def test_loan_installment_change_refreshes_discount(db, emprestimo):
+    _registrar(db, emprestimo, "2024-01-01", CDI_INVESTIR)
+    assert _analise(db)[0][1] == "Investir"
+
+    emprestimo.valor_parcela = 110.0
+    db.commit()
+
+    assert _analise(db)[0][1] == "Adiantar"
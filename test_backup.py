@@ -0,0 +1,89 @@
+"""
+Testes dos snapshots do banco: rotação, restauração do snapshot mais antigo mantido
+e validação da data/hora no endpoint de restauração
+"""
+import os
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import backup
+
+
+@pytest.fixture
+def banco(tmp_path, monkeypatch):
+    caminho = str(tmp_path / "loans.db")
+    conn = sqlite3.connect(caminho)
+    conn.execute("CREATE TABLE valores (versao INTEGER)")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setattr(backup, "BACKUP_KEEP", 2)
+    monkeypatch.setattr(backup, "_database_path", lambda: caminho)
+    return caminho
+
+
+def _gravar_versao(caminho, versao):
+    conn = sqlite3.connect(caminho)
+    conn.execute("DELETE FROM valores")
+    conn.execute("INSERT INTO valores VALUES (?)", (versao,))
+    conn.commit()
+    conn.close()
+
+
+def _ler_versao(caminho):
+    conn = sqlite3.connect(caminho)
+    try:
+        return conn.execute("SELECT versao FROM valores").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_snapshots_in_same_second_are_unique(banco):
+    _gravar_versao(banco, 1)
+    nomes = {backup.create_snapshot()["nome"] for _ in range(2)}
+    assert len(nomes) == 2
+    assert len(backup.list_snapshots()) == 2
+
+
+def test_restore_oldest_kept_snapshot(banco):
+    for versao in (1, 2, 3):
+        _gravar_versao(banco, versao)
+        backup.create_snapshot()
+
+    # Com BACKUP_KEEP=2 restam as versões 2 e 3; o snapshot de segurança rotaciona o da versão 2
+    mais_antigo = backup.list_snapshots()[0]
+    _gravar_versao(banco, 4)
+    resultado = backup.restore_snapshot(datetime.fromisoformat(mais_antigo["data_hora"]))
+
+    assert resultado["restaurado"]["nome"] == mais_antigo["nome"]
+    assert _ler_versao(banco) == 2
+    assert resultado["snapshot_seguranca"]["nome"] in {s["nome"] for s in backup.list_snapshots()}
+
+
+def test_restore_without_snapshot_raises(banco):
+    with pytest.raises(ValueError):
+        backup.restore_snapshot(datetime(2000, 1, 1))
+
+
+def test_restore_request_validates_and_converts_timezone(monkeypatch):
+    import main
+    from fastapi.testclient import TestClient
+
+    recebido = {}
+    monkeypatch.setattr(main, "restore_snapshot", lambda data_hora: recebido.setdefault("data_hora", data_hora))
+    main.app.dependency_overrides[main.require_admin] = lambda: None
+    try:
+        client = TestClient(main.app)
+        assert client.post("/admin/backups/restore", json={"data_hora": "garbage"}).status_code == 422
+
+        assert client.post("/admin/backups/restore", json={"data_hora": "2024-05-01T12:00:00Z"}).status_code == 200
+        esperado = datetime(2024, 5, 1, 12, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+        assert recebido["data_hora"] == esperado
+    finally:
+        main.app.dependency_overrides.clear()
@@ -0,0 +1,142 @@
+"""
+Testes da redução de pontos do gráfico de evolução: LTTB, agregação por intervalo
+e compatibilidade de GET /historico/all sem parâmetros
+"""
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from downsampling import aggregate_buckets, bucket_start, lttb
+
+
+def _serie(n, seed=1, inicio=date(2024, 1, 1)):
+    rng = random.Random(seed)
+    return [
+        {
+            "data_registro": (inicio + timedelta(days=i)).isoformat(),
+            "valor_parcela_adiantada": rng.uniform(90, 100),
+            "taxa_selic": 10.5,
+            "taxa_cdi": 10.4
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.mark.parametrize("n, alvo", [(1000, 300), (1000, 3), (301, 300), (50, 7)])
+def test_lttb_keeps_endpoints_and_returns_target_size(n, alvo):
+    serie = _serie(n)
+    reduzida = lttb(serie, alvo)
+    assert len(reduzida) == alvo
+    assert reduzida[0] is serie[0] and reduzida[-1] is serie[-1]
+    # Subconjunto em ordem, sem repetições
+    indices = [serie.index(p) for p in reduzida]
+    assert indices == sorted(set(indices))
+
+
+def test_lttb_keeps_peak():
+    serie = _serie(500)
+    serie[250]["valor_parcela_adiantada"] = 1000.0
+    assert serie[250] in lttb(serie, 20)
+
+
+@pytest.mark.parametrize("alvo", [100, 101, 500])
+def test_lttb_short_series_unchanged(alvo):
+    serie = _serie(100)
+    assert lttb(serie, alvo) == serie
+
+
+def test_week_buckets_start_on_monday():
+    # 2024-01-01 foi uma segunda-feira
+    assert bucket_start("2024-01-01", "week") == "2024-01-01"
+    assert bucket_start("2024-01-07", "week") == "2024-01-01"
+    assert bucket_start("2024-01-08T15:30:00", "week") == "2024-01-08"
+    assert bucket_start("2024-03-01", "week") == "2024-02-26"
+
+    semanas = list(aggregate_buckets(_serie(21), "week"))
+    assert [s["data_registro"] for s in semanas] == ["2024-01-01", "2024-01-08", "2024-01-15"]
+    assert all(date.fromisoformat(s["data_registro"]).weekday() == 0 for s in semanas)
+
+
+def test_month_buckets_carry_last_min_max():
+    serie = _serie(60)
+    meses = list(aggregate_buckets(serie, "month"))
+    assert [m["data_registro"] for m in meses] == ["2024-01-01", "2024-02-01"]
+
+    janeiro = [p["valor_parcela_adiantada"] for p in serie if p["data_registro"].startswith("2024-01")]
+    assert meses[0]["valor_parcela_adiantada"] == janeiro[-1]
+    assert meses[0]["valor_min"] == min(janeiro)
+    assert meses[0]["valor_max"] == max(janeiro)
+    assert meses[1]["valor_parcela_adiantada"] == serie[-1]["valor_parcela_adiantada"]
+
+
+def test_day_buckets_keep_one_point_per_day():
+    serie = _serie(3)
+    duplicada = [serie[0], {**serie[0], "data_registro": serie[0]["data_registro"] + "T12:00:00"}, serie[1], serie[2]]
+    assert [p["data_registro"] for p in aggregate_buckets(duplicada, "day")] == [p["data_registro"] for p in serie]
+
+
+def test_historico_all_without_parameters_keeps_payload(tmp_path):
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    import main
+    from database import Base, Emprestimo, HistoricoValorAdiantado
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'loans.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    rng = random.Random(5)
+    sessao = Session()
+    for i in range(5):
+        loan = Emprestimo(
+            descricao=f"L{i}", instituicao_credora="Banco", valor_parcela=100.0, valor_parcela_adiantada=98.0,
+            qtd_total_parcelas=12, qtd_parcelas_devidas=12, taxa_selic_registro=10.5, taxa_cdi_registro=10.4,
+            data_cadastro="2024-01-01", dia_vencimento=10
+        )
+        sessao.add(loan)
+        sessao.flush()
+        # Um empréstimo sem histórico e registros inseridos fora de ordem de data
+        for ponto in rng.sample(_serie(i * 4, seed=i), i * 4):
+            sessao.add(HistoricoValorAdiantado(emprestimo_id=loan.id, **ponto))
+    sessao.commit()
+
+    # Resposta esperada montada como o endpoint fazia antes da redução de pontos
+    esperado = []
+    for emprestimo in sessao.query(Emprestimo).all():
+        historicos = sessao.query(HistoricoValorAdiantado).filter(
+            HistoricoValorAdiantado.emprestimo_id == emprestimo.id
+        ).order_by(HistoricoValorAdiantado.data_registro).all()
+        if historicos:
+            esperado.append({
+                "emprestimo_id": emprestimo.id,
+                "emprestimo_nome": emprestimo.descricao,
+                "historicos": [
+                    {
+                        "data_registro": h.data_registro,
+                        "valor_parcela_adiantada": h.valor_parcela_adiantada,
+                        "taxa_selic": h.taxa_selic,
+                        "taxa_cdi": h.taxa_cdi
+                    } for h in historicos
+                ]
+            })
+    sessao.close()
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[main.get_db] = get_db
+    try:
+        assert TestClient(main.app).get("/historico/all").json() == esperado
+    finally:
+        main.app.dependency_overrides.clear()
+        engine.dispose()
@@ -0,0 +1,150 @@
+"""
+Testes das primitivas usadas para coordenar vários workers: lock entre processos,
+escrita atômica e o cache das taxas do BACEN
+"""
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.append(BACKEND_DIR)
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import file_utils
+from file_utils import atomic_write_path, file_lock
+from bacen_api import BacenAPI
+from database import Base, TaxaBacenCache
+
+
+@contextmanager
+def lock_em_outro_processo(caminho):
+    """
+    Mantém o lock em um processo separado enquanto o bloco executa
+    """
+    codigo = (
+        "import sys\n"
+        f"sys.path.append({BACKEND_DIR!r})\n"
+        "from file_utils import file_lock\n"
+        f"with file_lock({caminho!r}):\n"
+        "    print('ok', flush=True)\n"
+        "    sys.stdin.read()\n"
+    )
+    processo = subprocess.Popen(
+        [sys.executable, "-c", codigo], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        assert processo.stdout.readline().strip() == "ok"
+        yield
+    finally:
+        processo.stdin.close()
+        processo.wait(timeout=10)
+
+
+def test_non_blocking_lock_fails_while_other_process_holds_it(tmp_path):
+    caminho = str(tmp_path / "teste.lock")
+    with lock_em_outro_processo(caminho):
+        with file_lock(caminho, blocking=False) as adquirido:
+            assert adquirido is False
+    with file_lock(caminho, blocking=False) as adquirido:
+        assert adquirido is True
+
+
+def test_atomic_write_replaces_destination(tmp_path):
+    destino = tmp_path / "dados.txt"
+    destino.write_text("antigo")
+    with atomic_write_path(str(destino)) as temp_path:
+        with open(temp_path, "w") as f:
+            f.write("novo")
+        assert destino.read_text() == "antigo"
+    assert destino.read_text() == "novo"
+    assert os.listdir(tmp_path) == ["dados.txt"]
+
+
+def test_atomic_write_keeps_destination_on_error(tmp_path):
+    destino = tmp_path / "dados.txt"
+    destino.write_text("antigo")
+    with pytest.raises(RuntimeError):
+        with atomic_write_path(str(destino)) as temp_path:
+            with open(temp_path, "w") as f:
+                f.write("pela metade")
+            raise RuntimeError("falha no meio da escrita")
+    assert destino.read_text() == "antigo"
+    assert os.listdir(tmp_path) == ["dados.txt"]
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_utils, "LOCK_DIR", str(tmp_path))
+    engine = create_engine(f"sqlite:///{tmp_path / 'loans.db'}")
+    Base.metadata.create_all(bind=engine)
+    sessao = sessionmaker(bind=engine)()
+    yield sessao
+    sessao.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def consultas(monkeypatch):
+    """
+    Substitui a consulta ao BACEN; o teste define o resultado em consultas["resposta"]
+    """
+    estado = {"total": 0, "resposta": {"selic": 10.5, "cdi": 10.4}}
+
+    def buscar():
+        estado["total"] += 1
+        return {**estado["resposta"], "data_atualizacao": f"consulta {estado['total']}"}
+
+    monkeypatch.setattr(BacenAPI, "buscar_taxas_atuais", staticmethod(buscar))
+    monkeypatch.setattr(BacenAPI, "CACHE_TTL", 900)
+    monkeypatch.setattr(BacenAPI, "FAILURE_TTL", 60)
+    return estado
+
+
+def _envelhecer_cache(db, segundos):
+    registro = db.get(TaxaBacenCache, BacenAPI.CACHE_KEY)
+    registro.consultado_em = time.time() - segundos
+    db.commit()
+
+
+def test_cache_is_reused_within_ttl(db, consultas):
+    assert BacenAPI.buscar_taxas_com_cache(db)["cdi"] == 10.4
+    _envelhecer_cache(db, 120)
+    assert BacenAPI.buscar_taxas_com_cache(db)["data_atualizacao"] == "consulta 1"
+    assert consultas["total"] == 1
+
+
+def test_expired_cache_is_served_while_other_process_refreshes(db, consultas, tmp_path):
+    BacenAPI.buscar_taxas_com_cache(db)
+    _envelhecer_cache(db, 1000)
+
+    with lock_em_outro_processo(str(tmp_path / BacenAPI.LOCK_NAME)):
+        inicio = time.perf_counter()
+        taxas = BacenAPI.buscar_taxas_com_cache(db)
+        assert time.perf_counter() - inicio < 1
+    assert taxas["data_atualizacao"] == "consulta 1"
+    assert consultas["total"] == 1
+
+    # Lock livre: o cache expirado é atualizado
+    assert BacenAPI.buscar_taxas_com_cache(db)["data_atualizacao"] == "consulta 2"
+
+
+def test_failures_use_shorter_ttl(db, consultas):
+    consultas["resposta"] = {"selic": None, "cdi": None}
+    assert BacenAPI.buscar_taxas_com_cache(db)["cdi"] is None
+
+    # Dentro do FAILURE_TTL a falha vem do cache, sem repetir a consulta
+    _envelhecer_cache(db, 30)
+    BacenAPI.buscar_taxas_com_cache(db)
+    assert consultas["total"] == 1
+
+    # Passado o FAILURE_TTL (mas não o CACHE_TTL) consulta de novo
+    consultas["resposta"] = {"selic": 10.5, "cdi": 10.4}
+    _envelhecer_cache(db, 61)
+    assert BacenAPI.buscar_taxas_com_cache(db)["cdi"] == 10.4
+    assert consultas["total"] == 2
@@ -0,0 +1,100 @@
+"""
+Testes do otimizador de adiantamento (logic.optimize_prepayment)
+"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from logic import optimize_prepayment, calculate_monthly_discount_rate, calculate_cdb_monthly_return, get_recommendation
+
+CDI = 10.0  # CDB ~0,8355% a.m.
+
+
+def _parcelas(resultado):
+    return [(item["emprestimo_id"], item["parcelas_adiantar"]) for item in resultado["plano"]]
+
+
+def test_hand_computed_plan():
+    loans = [
+        (1, "A 10%", 110.0, 100.0, 3),
+        (2, "B 5%", 105.0, 100.0, 2),
+        (3, "C 5% mais barato", 52.5, 50.0, 4),
+        (4, "D 0,5% abaixo do CDB", 100.5, 100.0, 10),
+        (5, "E 8% não cabe", 216.0, 200.0, 1),
+    ]
+    resultado = optimize_prepayment(loans, 460.0, CDI)
+
+    # A leva 300; E (200) não cabe nos 160 restantes e é pulado; C empata com B mas é mais barato:
+    # 3 parcelas de 50 -> sobram 10, que não pagam uma parcela de B; D nunca entra
+    assert _parcelas(resultado) == [(1, 3), (3, 3)]
+    assert resultado["total_investido"] == 450.0
+    assert resultado["saldo_restante"] == 10.0
+    assert resultado["total_economy"] == pytest.approx(3 * 10 + 3 * 2.5)
+    assert [item["economia"] for item in resultado["plano"]] == [30.0, 7.5]
+    assert resultado["plano"][0]["discount_monthly_percent"] == pytest.approx(10.0)
+
+
+def test_equal_returns_prefer_cheaper_installments():
+    loans = [(2, "B", 105.0, 100.0, 2), (3, "C", 52.5, 50.0, 4)]
+    assert _parcelas(optimize_prepayment(loans, 100.0, CDI)) == [(3, 2)]
+    assert _parcelas(optimize_prepayment(loans, 400.0, CDI)) == [(3, 4), (2, 2)]
+
+
+def test_nothing_beats_cdb():
+    resultado = optimize_prepayment([(1, "D", 100.5, 100.0, 10)], 1000.0, CDI)
+    assert resultado["plano"] == []
+    assert resultado["total_investido"] == 0
+    assert resultado["saldo_restante"] == 1000.0
+
+
+def test_exact_fit_despite_float_noise():
+    # 0.3 // 0.1 == 2.0 em ponto flutuante; a tolerância mantém a terceira parcela
+    resultado = optimize_prepayment([(1, "centavos", 0.11, 0.1, 3)], 0.3, CDI)
+    assert _parcelas(resultado) == [(1, 3)]
+    assert resultado["saldo_restante"] == 0.0
+
+
+def _greedy_por_parcela(loans, orcamento, taxa_cdi):
+    """
+    Referência ingênua: expande cada parcela restante e compra uma a uma, da maior taxa para a menor
+    """
+    cdb = calculate_cdb_monthly_return(taxa_cdi)
+    parcelas = []
+    for loan_id, _, valor_parcela, adiantada, devidas in loans:
+        taxa = calculate_monthly_discount_rate(valor_parcela, adiantada)
+        if get_recommendation(taxa, cdb) == "Adiantar":
+            parcelas += [(-taxa, adiantada, loan_id, valor_parcela)] * devidas
+    parcelas.sort()
+
+    saldo = orcamento
+    compradas = {}
+    economia = 0.0
+    for _, adiantada, loan_id, valor_parcela in parcelas:
+        if adiantada <= saldo + 1e-9:
+            saldo -= adiantada
+            compradas[loan_id] = compradas.get(loan_id, 0) + 1
+            economia += valor_parcela - adiantada
+    return compradas, saldo, economia
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_per_installment_greedy(seed):
+    rng = random.Random(seed)
+    loans = []
+    for loan_id in range(1, 201):
+        adiantada = round(rng.uniform(50, 2000), 2)
+        # Descontos repetidos de propósito para exercitar os empates
+        desconto = rng.choice([0.004, 0.008, 0.01, 0.015, 0.02])
+        loans.append((loan_id, f"L{loan_id}", round(adiantada * (1 + desconto), 2), adiantada, rng.randint(0, 36)))
+    orcamento = rng.uniform(10_000, 500_000)
+
+    resultado = optimize_prepayment(loans, orcamento, CDI)
+    compradas, saldo, economia = _greedy_por_parcela(loans, orcamento, CDI)
+
+    assert dict(_parcelas(resultado)) == compradas
+    assert resultado["saldo_restante"] == pytest.approx(round(saldo, 2), abs=0.01)
+    assert resultado["total_economy"] == pytest.approx(economia, abs=0.01)
@@ -0,0 +1,121 @@
+"""
+Testes do profiler sob demanda: captura por cabeçalho, captura de requisições lentas
+e instalação condicionada ao ADMIN_TOKEN
+"""
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.append(BACKEND_DIR)
+
+from fastapi import BackgroundTasks, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import profiler
+
+TOKEN = "segredo"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(profiler, "ADMIN_TOKEN", TOKEN)
+    profiler.clear_profiles()
+
+    engine = create_engine("sqlite://")
+    profiler.install_sql_listeners(engine)
+
+    app = FastAPI()
+    app.router.route_class = profiler.ProfiledRoute
+    app.add_middleware(profiler.ProfilingMiddleware)
+
+    @app.get("/consulta")
+    def consulta():
+        with engine.connect() as conn:
+            return {"valor": conn.execute(text("SELECT 1")).scalar()}
+
+    @app.get("/lenta")
+    def lenta():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 2")).scalar()
+        time.sleep(0.1)
+        return {"ok": True}
+
+    @app.post("/com-tarefa")
+    def com_tarefa(background_tasks: BackgroundTasks):
+        background_tasks.add_task(time.sleep, 0.3)
+        return {"ok": True}
+
+    @app.get("/admin/profiles", dependencies=[Depends(profiler.require_admin)])
+    def read_profiles():
+        return profiler.list_profiles()
+
+    yield TestClient(app)
+    profiler.clear_profiles()
+
+
+def test_header_captures_sql_and_cprofile(client):
+    resposta = client.get("/consulta", headers={"X-Debug-Profile": TOKEN})
+    assert resposta.json() == {"valor": 1}
+
+    resumo = client.get("/admin/profiles", headers={"X-Admin-Token": TOKEN}).json()
+    assert len(resumo) == 1 and resumo[0]["trigger"] == "header"
+
+    captura = profiler.get_profile(resumo[0]["id"])
+    assert captura["sql_count"] >= 1
+    assert any("SELECT 1" in instrucao["sql"] for instrucao in captura["sql"])
+    assert "consulta" in captura["profile"]
+
+
+def test_fast_request_without_header_is_not_stored(client):
+    client.get("/consulta")
+    client.get("/consulta", headers={"X-Debug-Profile": "token-errado"})
+    assert profiler.list_profiles() == []
+
+
+def test_slow_request_captures_sql_and_stack_samples(client, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_SLOW_MS", 50)
+    monkeypatch.setattr(profiler, "_sampler", profiler._StackSampler(1))
+    client.get("/consulta")
+    client.get("/lenta")
+
+    [resumo] = profiler.list_profiles()
+    captura = profiler.get_profile(resumo["id"])
+    assert captura["path"] == "/lenta"
+    assert captura["trigger"] == "slow"
+    assert [instrucao["sql"] for instrucao in captura["sql"]] == ["SELECT 2"]
+    assert "Amostragem de pilhas" in captura["profile"]
+    assert "(lenta)" in captura["profile"]
+
+
+def test_background_tasks_do_not_count_as_slow(client, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_SLOW_MS", 200)
+    client.post("/com-tarefa")
+    assert profiler.list_profiles() == []
+
+
+def test_admin_endpoints_require_token(client, monkeypatch):
+    assert client.get("/admin/profiles").status_code == 403
+    monkeypatch.setattr(profiler, "ADMIN_TOKEN", None)
+    assert client.get("/admin/profiles", headers={"X-Admin-Token": TOKEN}).status_code == 404
+
+
+@pytest.mark.parametrize("token, instalado", [("", False), (TOKEN, True)])
+def test_profiler_installed_only_with_admin_token(token, instalado):
+    codigo = (
+        "import main, profiler\n"
+        "from sqlalchemy import event\n"
+        "middleware = any(m.cls is profiler.ProfilingMiddleware for m in main.app.user_middleware)\n"
+        "listener = event.contains(main.engine, 'after_cursor_execute', profiler._after_cursor_execute)\n"
+        "print(middleware, listener, main.app.router.route_class is profiler.ProfiledRoute)\n"
+    )
+    env = {**os.environ, "ADMIN_TOKEN": token}
+    resultado = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    assert resultado.stdout.split() == [str(instalado)] * 3
@@ -0,0 +1,105 @@
+"""
+Testes do CDI de equilíbrio e da simulação de mudança do CDI (GET /simulacao/cdi)
+"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import main
+from database import Base, Emprestimo
+from logic import calculate_break_even_cdi, calculate_cdb_monthly_return, calculate_monthly_discount_rate, get_recommendation
+
+
+@pytest.mark.parametrize("desconto", [0.0, 0.01, 0.5, 0.8355, 1.0, 2.5, 10.0])
+def test_break_even_round_trip(desconto):
+    assert calculate_cdb_monthly_return(calculate_break_even_cdi(desconto)) == pytest.approx(desconto, abs=1e-12)
+
+
+@pytest.fixture(scope="module")
+def carteira(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('cdi') / 'loans.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    rng = random.Random(7)
+    sessao = Session()
+    for i in range(300):
+        adiantada = round(rng.uniform(100, 3000), 2)
+        sessao.add(Emprestimo(
+            descricao=f"L{i}", instituicao_credora="Banco", valor_parcela=round(adiantada * (1 + rng.uniform(0.002, 0.015)), 2),
+            valor_parcela_adiantada=adiantada, qtd_total_parcelas=48, qtd_parcelas_devidas=rng.randint(1, 48),
+            taxa_selic_registro=10.5, taxa_cdi_registro=10.4, data_cadastro="2024-01-01", dia_vencimento=10
+        ))
+    sessao.commit()
+    loans = [
+        (e.id, e.valor_parcela, e.valor_parcela_adiantada, e.qtd_parcelas_devidas, e.cdi_break_even)
+        for e in sessao.query(Emprestimo)
+    ]
+    sessao.close()
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[main.get_db] = get_db
+    yield TestClient(main.app), loans
+    main.app.dependency_overrides.clear()
+    engine.dispose()
+
+
+def _viradas_varredura_completa(loans, cdi_atual, cdi_novo):
+    cdb_atual = calculate_cdb_monthly_return(cdi_atual)
+    cdb_novo = calculate_cdb_monthly_return(cdi_novo)
+    viradas = {}
+    for loan_id, valor_parcela, adiantada, devidas, _ in loans:
+        desconto = calculate_monthly_discount_rate(valor_parcela, adiantada)
+        atual, nova = get_recommendation(desconto, cdb_atual), get_recommendation(desconto, cdb_novo)
+        if atual != nova:
+            economia = (valor_parcela - adiantada) * devidas
+            viradas[loan_id] = economia if nova == "Adiantar" else -economia
+    return viradas
+
+
+def _pares_de_cdi(loans):
+    rng = random.Random(3)
+    equilibrios = sorted(loan[4] for loan in loans)
+    pares = [(rng.uniform(2, 20), rng.uniform(2, 20)) for _ in range(20)]
+    # Bordas: CDI exatamente igual ao equilíbrio de algum empréstimo, nos dois sentidos
+    for cdi in rng.sample(equilibrios, 10):
+        pares += [(cdi, cdi + 1), (cdi + 1, cdi), (cdi - 1, cdi), (cdi, cdi - 1)]
+    return pares
+
+
+def test_range_query_matches_full_pass(carteira):
+    client, loans = carteira
+    for cdi_atual, cdi_novo in _pares_de_cdi(loans):
+        resposta = client.get("/simulacao/cdi", params={"cdi_atual": cdi_atual, "cdi_novo": cdi_novo}).json()
+        esperado = _viradas_varredura_completa(loans, cdi_atual, cdi_novo)
+
+        assert {v["emprestimo_id"] for v in resposta["viradas"]} == set(esperado), (cdi_atual, cdi_novo)
+        assert resposta["total_viradas"] == len(esperado)
+        assert resposta["variacao_economia"] == pytest.approx(sum(esperado.values()))
+
+
+def test_economy_change_sign_follows_direction(carteira):
+    client, _ = carteira
+    subida = client.get("/simulacao/cdi", params={"cdi_atual": 8, "cdi_novo": 14}).json()
+    queda = client.get("/simulacao/cdi", params={"cdi_atual": 14, "cdi_novo": 8}).json()
+
+    assert subida["total_viradas"] > 0
+    # CDI sobe: empréstimos deixam de valer a pena adiantar; CDI cai: passam a valer
+    assert all(v["recommendation_nova"] == "Investir" for v in subida["viradas"])
+    assert all(v["recommendation_nova"] == "Adiantar" for v in queda["viradas"])
+    assert subida["variacao_economia"] < 0 < queda["variacao_economia"]
+    assert subida["variacao_economia"] == pytest.approx(-queda["variacao_economia"])
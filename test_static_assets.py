@@ -0,0 +1,63 @@
+"""
+Testes do build do frontend (nomes com hash, pré-compressão) com vários workers ao mesmo tempo
+"""
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+sys.path.append(BACKEND_DIR)
+
+from static_assets import build_static_assets
+
+ANTIGOS = ("app.000000000000.js", "app.000000000000.js.gz", "styles.111111111111.css", "styles.111111111111.css.gz")
+
+
+def _fonte(pasta, versao):
+    pasta.mkdir(exist_ok=True)
+    (pasta / "index.html").write_text('<link href="styles.css"><script src="app.js"></script>')
+    (pasta / "styles.css").write_text("body { color: black; }")
+    (pasta / "app.js").write_text(f"console.log({versao});")
+
+
+def _builds_simultaneos(fonte, saida, quantidade):
+    codigo = (
+        "import sys\n"
+        f"sys.path.append({BACKEND_DIR!r})\n"
+        "from static_assets import build_static_assets\n"
+        f"build_static_assets({str(fonte)!r}, {str(saida)!r})\n"
+    )
+    processos = [
+        subprocess.Popen([sys.executable, "-c", codigo], stderr=subprocess.PIPE, text=True)
+        for _ in range(quantidade)
+    ]
+    return [(p.wait(timeout=60), p.stderr.read()) for p in processos]
+
+
+def test_build_hashes_and_rewrites_html(tmp_path):
+    _fonte(tmp_path / "src", 1)
+    manifesto = build_static_assets(str(tmp_path / "src"), str(tmp_path / "build"))
+
+    html = (tmp_path / "build" / "index.html").read_text()
+    assert f'src="{manifesto["app.js"]}"' in html
+    assert f'href="{manifesto["styles.css"]}"' in html
+    assert (tmp_path / "build" / (manifesto["app.js"] + ".gz")).exists()
+
+
+def test_concurrent_builds_remove_stale_hashes(tmp_path):
+    fonte, saida = tmp_path / "src", tmp_path / "build"
+    for versao in range(1, 6):
+        _fonte(fonte, versao)
+        saida.mkdir(exist_ok=True)
+        for nome in ANTIGOS:
+            (saida / nome).write_text("versão antiga")
+
+        resultados = _builds_simultaneos(fonte, saida, 4)
+        assert all(codigo == 0 for codigo, _ in resultados), [erro for codigo, erro in resultados if codigo]
+
+        manifesto = build_static_assets(str(fonte), str(saida))
+        presentes = set(os.listdir(saida))
+        assert not presentes & set(ANTIGOS)
+        assert {manifesto["app.js"], manifesto["styles.css"], "index.html"} <= presentes
+        # Só o hash da versão atual do app.js permanece
+        assert sorted(n for n in presentes if n.startswith("app.") and n.endswith(".js")) == sorted([manifesto["app.js"], "app.js"])